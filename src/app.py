@@ -1,13 +1,54 @@
 import os
-import re
-import glob
+import uuid
+
 import streamlit as st
 from langchain.callbacks.streamlit import StreamlitCallbackHandler
 
 from src.aws.main import search
+from src.aws.memory import clear_memory
+from src.aws.render_cache import render_cache
+from src.aws.streaming import StreamingAnswerHandler
+from src.model.config import METRICS_HOST, METRICS_PORT
+from src.model.tracing import start_metrics_server, tracer
 
 st.title("👩🏻‍💻 Suparock AWS Architect 🚀")
 
+# Expose OpenMetrics on /metrics; started once per process across Streamlit reruns
+start_metrics_server(METRICS_PORT, METRICS_HOST)
+
+
+def draw_waterfall(spans):
+    """Draws the spans of one request as a waterfall, children indented under their parents."""
+    # matplotlib is only imported once there is a trace to draw. A bare Figure is not registered
+    # with pyplot, so every rerun's waterfall is freed once Streamlit has rendered it
+    from matplotlib.figure import Figure
+
+    start = min(span["start"] for span in spans)
+    depths = {}
+    for span in spans:
+        depths[span["span_id"]] = depths.get(span["parent_id"], -1) + 1
+
+    fig = Figure(figsize=(4, 0.3 * len(spans) + 0.6))
+    ax = fig.subplots()
+    for row, span in enumerate(spans):
+        offset = (span["start"] - start) * 1000
+        duration = span["duration_ms"] or 0
+        ax.barh(row, duration, left=offset, color="tab:red" if span["error"] else "tab:blue")
+        label = "  " * depths[span["span_id"]] + span["name"]
+        if span["attributes"].get("cache_hit"):
+            label += " (cached)"
+        ax.text(offset, row, f" {label} {duration:.0f}ms", va="center", fontsize=6)
+    ax.invert_yaxis()
+    ax.set_yticks([])
+    ax.set_xlabel("ms", fontsize=7)
+    ax.tick_params(labelsize=6)
+    fig.tight_layout()
+    return fig
+
+# Namespaces the generated artifacts of this browser session
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Sidebar with application information and reset functionality
 st.sidebar.title("🛠️ About Suparock")
 st.sidebar.markdown("""
@@ -21,9 +62,9 @@ Users can input their queries, and the AWS architect will process these using th
 st.sidebar.markdown("---")
 st.sidebar.header("🔧 Utilities")
 if st.sidebar.button('🔄 Reset Application'):
-    # Delete all PNG files in the directory on reset
-    for file_path in glob.glob('*.png'):
-        os.remove(file_path)
+    # Delete this session's generated images on reset
+    render_cache.clear_session(st.session_state.session_id)
+    clear_memory(st.session_state.session_id)
     # Clear the session state
     st.session_state.messages = []
     st.rerun()
@@ -42,8 +83,9 @@ for message in st.session_state.messages:
     role = message["role"]
     with st.chat_message(role, avatar=avatars[role]):
         st.markdown(message["content"])
-        if "image" in message:
-            st.image(message["image"])
+        for image in message.get("images", []):
+            if os.path.exists(image):
+                st.image(image)
 
 # Input for new queries
 if prompt := st.chat_input("What is my AWS bill for July 2024?"):
@@ -55,27 +97,45 @@ if prompt := st.chat_input("What is my AWS bill for July 2024?"):
     # Callback handler for the search function
     st_callback = StreamlitCallbackHandler(st.container())
 
+    # Placeholders the answer and RAG tool generations are streamed into
+    with st.chat_message("assistant", avatar=avatars["assistant"]):
+        tool_placeholder = st.empty()
+        answer_placeholder = st.empty()
+    stream_handler = StreamingAnswerHandler(answer_placeholder, tool_placeholder)
+
     # Call the search function and handle the response
-    response = search(prompt, callbacks=[st_callback])
+    response = search(prompt, callbacks=[st_callback, stream_handler], session_id=st.session_state.session_id)
 
     # Process the response and display it
     if response and "output" in response:
         message_data = {"role": "assistant", "content": response["output"]}
-        # Regex to extract image path from the output
-        image_path_match = re.search(r'"?([\w/\\]+\.png)"?', response["output"])
-        if image_path_match:
-            image_path = image_path_match.group(1)
-            if os.path.exists(image_path):
-                message_data["image"] = image_path
-
-        # Append the response to session state and display it
+        # Images rendered by the Python interpreter tool come back as structured tool output
+        images = []
+        for _, observation in response.get("intermediate_steps", []):
+            if isinstance(observation, dict):
+                images.extend(image for image in observation.get("images", []) if image not in images)
+        if images:
+            message_data["images"] = images
+
+        # Append the response to session state and replace the streamed text with the final answer
         st.session_state.messages.append(message_data)
-        with st.chat_message("assistant", avatar=avatars["assistant"]):
+        with answer_placeholder.container():
             st.markdown(response["output"])
-            if "image" in message_data:
-                st.image(message_data["image"])
+            for image in images:
+                st.image(image)
+
+        # Input tokens are the main cost and latency driver of multi-step runs
+        token_usage = response.get("token_usage", [])
+        if token_usage:
+            st.sidebar.markdown("**Last request: input tokens per LLM call**")
+            st.sidebar.caption(", ".join(str(step["input_tokens"]) for step in token_usage))
+
+        # Where the time of this turn went
+        spans = tracer.get_trace(response.get("trace_id", ""))
+        if spans:
+            st.sidebar.markdown("**Last request: trace**")
+            st.sidebar.pyplot(draw_waterfall(spans))
     else:
         error_message = "Sorry, I could not process your request."
         st.session_state.messages.append({"role": "assistant", "content": error_message})
-        with st.chat_message("assistant", avatar=avatars["assistant"]):
-            st.markdown(error_message)
+        answer_placeholder.markdown(error_message)
@@ -1,14 +1,54 @@
-from langchain import hub
-from langchain.agents import create_react_agent, AgentExecutor
+import os
+import textwrap
+import threading
+from typing import TYPE_CHECKING, Any, List, Tuple
 
+from langchain_core.agents import AgentAction
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnablePassthrough
+from langchain_core.tools import render_text_description
+
+from src.aws.memory import NO_HISTORY, truncate_to_tokens
 from src.aws.tools import TOOLS
-from src.model.config import LLM
+from src.model.config import (
+    CACHE_DIR,
+    SCRATCHPAD_OBSERVATION_TOKENS,
+    SCRATCHPAD_RECENT_OBSERVATIONS,
+)
+from src.model.registry import get_llm
+from src.model.tracing import span
 
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
 
-def construct_agent():
-    prompt = hub.pull("hwchase17/react")
-    prompt.template = (
-        """
+REACT_PROMPT_HANDLE = "hwchase17/react"
+REACT_PROMPT_CACHE_PATH = os.path.join(CACHE_DIR, "prompts", "hwchase17_react.txt")
+
+# The react template is split here into the static instructions and the per-request question
+REACT_PROMPT_SPLIT = "Begin!"
+
+# Vendored copy of hwchase17/react, used when the hub is unreachable and nothing is cached yet
+REACT_PROMPT_FALLBACK = """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+SYSTEM_PROMPT = """
         You are my trusted DevOps Engineer with full access and permissions to my AWS setup.
         The month is 2024 July.
         Your role is to assist the customer with their request.
@@ -39,6 +79,10 @@ def construct_agent():
 
             If you face Access Denied errors, you should let the customer know that you don't have access to the
             requested information.
+
+            Large outputs are compacted: arrays are replaced by a count, a summary and a sample, and a
+            "result_handle" is returned. Use the aws_result_query_tool with that handle to page through
+            the full result or to select fields with a JMESPath expression instead of re-running the command.
             
         3. You can generate Python code for AWS cloud architecture diagrams using the aws_cloud_diagram_code_tool. 
            However, you will need to use the Python interpreter tool to execute the code to generate the image.
@@ -61,14 +105,140 @@ def construct_agent():
            
            Therefore, your image path should be formatted with snake path and lowercase e.g. standard_kubernetes_ap.png
 
+           Each run executes in its own directory, so the generated image is listed in "images" in the output.
+           Return that path as the image path; the image is shown to the customer automatically.
+
         5.  You can suggest a suitable Amazon Web service based on the AWS Whitepaper Overview of Amazon Web Services using the web_service_search_tool.
             There is no need to refer to the AWS Well-Architected Framework using the well_arch_tool if the user is asking explicitly for a web service. 
             You should suggest the most relevant web services to help with the user input.
             You should consider the industry and organisation type of the user.
+
+        6.  You can query the full result of a compacted AWS CLI output using the aws_result_query_tool.
+            Its Action Input is a single line: either the result_handle followed by an optional JMESPath expression,
+            e.g. 3f2a9c1b7d4e Reservations[].Instances[].InstanceId, or a JSON object to page through a list, e.g.
+            {"handle": "3f2a9c1b7d4e", "expression": "Reservations[].Instances[]", "offset": 20, "limit": 20}.
+            Lists return 20 items from offset 0 unless you pass offset and limit.
+
+        7.  When a request needs more than one of best practices, service selection and diagram code, use the
+            aws_knowledge_tool once instead of calling the well_arch_tool, the web_service_search_tool and the
+            aws_cloud_diagram_code_tool one after another. It searches all three documents at once and answers
+            with numbered citations followed by its sources; keep the citations in your final response.
+            Diagram code it returns still has to be run with the Python interpreter tool to generate the image.
+
+        8.  When you need several tool calls that do not depend on each other's results, for example AWS CLI
+            commands for different services or regions, write them one after another, each with its own Action
+            and Action Input lines, before the Observation. They run at the same time and you get one
+            Observation per action, in the same order.
+        """
+
+# Earlier turns of the conversation, filled in per session by search()
+CHAT_HISTORY_PROMPT = """
+        Previous conversation with the customer. If it already contains the facts or tool results needed to
+        answer, reuse them instead of calling the tools again:
+
+        {chat_history}
+
         """
-        + prompt.template
+
+_agent_executor = None
+_agent_executor_lock = threading.Lock()
+
+
+def load_react_prompt() -> str:
+    """
+    Returns the hwchase17/react template, pulling it from the hub at most once.
+
+    The pulled template is cached on disk so later processes start without a network
+    round trip; if the hub cannot be reached the vendored copy is used instead.
+    """
+    if os.path.exists(REACT_PROMPT_CACHE_PATH):
+        with open(REACT_PROMPT_CACHE_PATH) as f:
+            return f.read()
+
+    try:
+        with span("hub.pull", "http", handle=REACT_PROMPT_HANDLE):
+            # langchain.hub is slow to import and only needed when the prompt is not cached yet
+            from langchain import hub
+
+            template = hub.pull(REACT_PROMPT_HANDLE).template
+    except Exception:
+        return REACT_PROMPT_FALLBACK
+
+    os.makedirs(os.path.dirname(REACT_PROMPT_CACHE_PATH), exist_ok=True)
+    with open(REACT_PROMPT_CACHE_PATH, "w") as f:
+        f.write(template)
+    return template
+
+
+def split_react_prompt(template: str) -> Tuple[str, str]:
+    """Splits the react template into its static instructions and the dynamic question part."""
+    if REACT_PROMPT_SPLIT not in template:
+        template = REACT_PROMPT_FALLBACK
+    head, tail = template.split(REACT_PROMPT_SPLIT, 1)
+    return head + REACT_PROMPT_SPLIT, tail.lstrip("\n")
+
+
+def build_agent_prompt(tools) -> ChatPromptTemplate:
+    """
+    Builds the agent prompt as a static system message and a dynamic human message.
+
+    The system message holds the instructions and the rendered tool descriptions, so it is
+    byte-identical across steps, sessions and requests and can be served from the Bedrock
+    prompt cache. The chat history, question and scratchpad go in the human message.
+    """
+    react_head, react_tail = split_react_prompt(load_react_prompt())
+    system = textwrap.dedent(SYSTEM_PROMPT).strip() + "\n\n" + react_head
+    system = system.replace("{tools}", render_text_description(list(tools)))
+    system = system.replace("{tool_names}", ", ".join(tool.name for tool in tools))
+    human = textwrap.dedent(CHAT_HISTORY_PROMPT).lstrip() + react_tail
+
+    return ChatPromptTemplate.from_messages(
+        [("system", system.replace("{", "{{").replace("}", "}}")), ("human", human)]
+    ).partial(chat_history=NO_HISTORY)
+
+
+def format_scratchpad(intermediate_steps: List[Tuple[AgentAction, Any]]) -> str:
+    """
+    Renders the ReAct scratchpad, truncating all but the latest observations.
+
+    Older observations have usually been digested into the following thoughts, and large
+    AWS CLI results stay reachable through their result handle.
+    """
+    thoughts = ""
+    recent = len(intermediate_steps) - SCRATCHPAD_RECENT_OBSERVATIONS
+    for index, (action, observation) in enumerate(intermediate_steps):
+        observation = str(observation)
+        if index < recent:
+            observation = truncate_to_tokens(observation, SCRATCHPAD_OBSERVATION_TOKENS)
+        thoughts += action.log
+        thoughts += f"\nObservation: {observation}\nThought: "
+    return thoughts
+
+
+def construct_agent() -> "AgentExecutor":
+    from langchain.agents import AgentExecutor
+
+    from src.aws.output_parser import MultiActionReActOutputParser
+
+    prompt = build_agent_prompt(TOOLS)
+    # Same pipeline as create_react_agent, with the compacting scratchpad formatter
+    agent = (
+        RunnablePassthrough.assign(agent_scratchpad=lambda x: format_scratchpad(x["intermediate_steps"]))
+        | prompt
+        | get_llm("agent").bind(stop=["\nObservation"])
+        | MultiActionReActOutputParser()
     )
-    agent = create_react_agent(LLM, TOOLS, prompt)
 
-    return AgentExecutor(agent=agent, tools=TOOLS, handle_parsing_errors=True)
+    # Intermediate steps carry structured tool outputs, such as rendered images, back to the app
+    return AgentExecutor(agent=agent, tools=TOOLS, handle_parsing_errors=True, return_intermediate_steps=True)
+
+
+def get_agent_executor() -> "AgentExecutor":
+    """Returns the process-wide agent executor, constructing it on first use."""
+    global _agent_executor
+    if _agent_executor is None:
+        with _agent_executor_lock:
+            if _agent_executor is None:
+                _agent_executor = construct_agent()
+    return _agent_executor
 
@@ -0,0 +1,109 @@
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.aws.ingest import corpus_version
+from src.model.cache import LRUCache
+from src.model.config import (
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_TTL,
+)
+
+
+def tables_version(table_name: str) -> str:
+    """Returns the corpus version of a table, or of every table of a "+"-joined multi-corpus key."""
+    return "|".join(str(corpus_version(name)) for name in table_name.split("+"))
+
+
+def answer_payload(query: str, result: str, source_documents: List[Document], cached: bool) -> Dict[str, Any]:
+    """Returns a RAG tool response; cached and freshly generated answers have the same keys."""
+    return {"query": query, "result": result, "source_documents": source_documents, "cached": cached}
+
+
+class SemanticAnswerCache:
+    """
+    Caches RAG tool answers keyed by tool name and query-embedding similarity.
+
+    A lookup returns a stored answer when a previous query to the same tool is at least
+    `threshold` cosine-similar and the tool's corpus has not been re-ingested since. Tools
+    that answer from several tables key their entries by the "+"-joined table names.
+    Entries expire after `ttl` seconds and the least recently used are evicted first.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_SIMILARITY,
+        ttl: float = ANSWER_CACHE_TTL,
+        maxsize: int = ANSWER_CACHE_SIZE,
+    ):
+        self.threshold = threshold
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def lookup(self, tool_name: str, table_name: str, query_vector: List[float]) -> Optional[Dict[str, Any]]:
+        version = tables_version(table_name)
+        candidates = []
+        for key, entry in self.entries.items():
+            if entry["tool"] != tool_name or entry["table"] != table_name:
+                continue
+            if entry["version"] != version:
+                # The corpus was re-ingested since this answer was generated
+                self.entries.pop(key)
+                continue
+            candidates.append((key, entry))
+        if not candidates:
+            self.entries.misses += 1
+            return None
+
+        query = self._normalize(query_vector)
+        similarities = np.stack([entry["vector"] for _, entry in candidates]) @ query
+        best = int(np.argmax(similarities))
+        key, entry = candidates[best]
+        if similarities[best] < self.threshold:
+            self.entries.misses += 1
+            return None
+
+        self.entries.get(key)
+        return answer_payload(entry["query"], entry["result"], entry["source_documents"], cached=True)
+
+    def store(
+        self,
+        tool_name: str,
+        table_name: str,
+        query_vector: List[float],
+        query: str,
+        result: str,
+        source_documents: List[Document],
+    ) -> None:
+        self.entries.set(
+            uuid.uuid4().hex,
+            {
+                "tool": tool_name,
+                "table": table_name,
+                "version": tables_version(table_name),
+                "vector": self._normalize(query_vector),
+                "query": query,
+                "result": result,
+                "source_documents": source_documents,
+            },
+        )
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drops every cached answer, or only those generated from the given table."""
+        for key, entry in self.entries.items():
+            if table_name is None or table_name in entry["table"].split("+"):
+                self.entries.pop(key)
+
+    def stats(self) -> Dict[str, int]:
+        return self.entries.stats()
+
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,199 @@
+"""
+Headless batch runner for the agent.
+
+Reads queries from a JSONL file or stdin and answers them concurrently on one warm agent,
+appending one JSON line per query to the output as soon as it completes. Input lines are
+either plain text queries or objects such as
+
+    {"id": "audit-prod-s3", "query": "Which S3 buckets are public?", "profile": "prod", "region": "us-east-1"}
+
+With --resume, queries whose id already has a successful result in the output are skipped,
+so an interrupted run can be restarted with the same command.
+
+    poetry run search_batch queries.jsonl --output results.jsonl --workers 8 --rpm 60 --resume
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, TextIO
+
+from src.aws.agent import get_agent_executor
+from src.aws.context import aws_scope
+from src.aws.main import asearch
+from src.aws.memory import clear_memory, format_observation
+from src.model.config import BATCH_WORKERS, BEDROCK_REQUESTS_PER_MINUTE
+from src.model.throttle import RateLimitCallbackHandler, RateLimiter
+
+
+def parse_queries(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """Parses JSONL or plain text lines into query items, giving each a stable id."""
+    items = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line) if line.startswith("{") else {"query": line}
+        if "query" not in item:
+            raise ValueError(f"Batch input line has no query: {line[:200]}")
+        # Ids derived from the content keep --resume working when the input is reordered
+        item.setdefault("id", hashlib.sha256(json.dumps(item, sort_keys=True).encode("utf-8")).hexdigest()[:12])
+        items.append(item)
+    return items
+
+
+def completed_ids(output_path: Optional[str]) -> Set[str]:
+    """Returns the ids that already have a successful result in the output file."""
+    if not output_path or not os.path.exists(output_path):
+        return set()
+    ids = set()
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if not record.get("error"):
+                ids.add(record["id"])
+    return ids
+
+
+def format_steps(intermediate_steps) -> List[Dict[str, Any]]:
+    return [
+        {"tool": action.tool, "tool_input": action.tool_input, "observation": format_observation(observation)}
+        for action, observation in intermediate_steps
+    ]
+
+
+def summarize_usage(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals the query's LLM calls, overall and per model, so routing tiers can be compared."""
+    by_model: Dict[str, Dict[str, float]] = {}
+    for step in steps:
+        model = by_model.setdefault(
+            step.get("model_id") or "unknown", {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "latency_ms": 0.0}
+        )
+        model["llm_calls"] += 1
+        model["input_tokens"] += step["input_tokens"]
+        model["output_tokens"] += step["output_tokens"]
+        model["latency_ms"] += step.get("latency_ms") or 0.0
+    return {
+        "input_tokens": sum(step["input_tokens"] for step in steps),
+        "output_tokens": sum(step["output_tokens"] for step in steps),
+        "llm_calls": len(steps),
+        "by_model": by_model,
+    }
+
+
+async def run_query(item: Dict[str, Any], callbacks: List[Any]) -> Dict[str, Any]:
+    """Answers one query in its own session and returns the result record."""
+    session_id = item.get("session_id") or f"batch-{item['id']}"
+    record = {
+        "id": item["id"],
+        "query": item["query"],
+        "profile": item.get("profile"),
+        "region": item.get("region"),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    start = time.perf_counter()
+    try:
+        with aws_scope(item.get("profile"), item.get("region")):
+            result = await asearch(item["query"], callbacks=callbacks, session_id=session_id)
+        record.update(
+            output=result["output"],
+            steps=format_steps(result["intermediate_steps"]),
+            token_usage=summarize_usage(result["token_usage"]),
+            trace_id=result["trace_id"],
+            error=None,
+        )
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        # Batch queries are independent, so their conversation memory is not kept
+        if not item.get("session_id"):
+            clear_memory(session_id)
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+async def run_batch(
+    items: List[Dict[str, Any]],
+    output: TextIO,
+    workers: int = BATCH_WORKERS,
+    requests_per_minute: int = BEDROCK_REQUESTS_PER_MINUTE,
+) -> Dict[str, int]:
+    """
+    Runs the queries on a pool of worker tasks sharing one agent and its caches.
+
+    Args:
+    items (List[Dict[str, Any]]): Query items with an id and a query.
+    output (TextIO): Stream the JSONL result records are appended to as queries complete.
+    workers (int): Number of queries in flight.
+    requests_per_minute (int): Rate limit for the agent's Bedrock LLM calls, 0 for none.
+
+    Returns:
+    Dict[str, int]: Counts of completed and failed queries.
+    """
+    # Build the agent before the workers start so they don't all pay for the prompt pull
+    get_agent_executor()
+    callbacks = [RateLimitCallbackHandler(RateLimiter(requests_per_minute))] if requests_per_minute else []
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+    stats = {"completed": 0, "failed": 0}
+
+    async def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            record = await run_query(item, callbacks)
+            output.write(json.dumps(record, default=str) + "\n")
+            output.flush()
+            stats["failed" if record["error"] else "completed"] += 1
+            print(
+                f"[{stats['completed'] + stats['failed']}/{len(items)}] {record['id']} "
+                f"{'failed' if record['error'] else 'done'} in {record['elapsed_ms'] / 1000:.1f}s",
+                file=sys.stderr,
+            )
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a batch of queries with the agent")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL or plain text query file, - for stdin")
+    parser.add_argument("--output", "-o", help="JSONL file results are appended to, defaults to stdout")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="concurrent queries")
+    parser.add_argument("--rpm", type=int, default=BEDROCK_REQUESTS_PER_MINUTE, help="Bedrock LLM requests per minute")
+    parser.add_argument("--resume", action="store_true", help="skip queries that already succeeded in the output")
+    args = parser.parse_args()
+
+    if args.input == "-":
+        items = parse_queries(sys.stdin)
+    else:
+        with open(args.input) as f:
+            items = parse_queries(f)
+    if args.resume:
+        done = completed_ids(args.output)
+        items = [item for item in items if item["id"] not in done]
+        print(f"Resuming: {len(done)} already completed, {len(items)} to run", file=sys.stderr)
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        stats = asyncio.run(run_batch(items, output, args.workers, args.rpm))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(stats), file=sys.stderr)
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import os
+import re
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import fitz
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Namespace for section ids, so chunks of the same section share a parent_id across runs
+SECTION_ID_NAMESPACE = uuid.UUID("0f6f1b8e-2a47-4c1e-9f43-8a51b9d3c7e2")
+
+MONOSPACE_FLAG = 8
+BOLD_FLAG = 16
+MONOSPACE_FONTS = ("mono", "menlo", "courier", "consol", "code")
+
+# A block is a heading when its text is at least this much larger than the body text
+HEADING_SIZE_RATIO = 1.15
+MAX_HEADING_LENGTH = 150
+PROSE_LINE_LENGTH = 80
+PROSE_ENDINGS = (".", ",", ":", ";")
+# Table of contents entries ("Introduction ........ 3") are styled like headings but are not sections
+TOC_ENTRY = re.compile(r"\.{4,}\s*\d+$")
+
+# Lines repeated on at least this share of pages are running headers and footers
+BOILERPLATE_PAGE_RATIO = 0.5
+
+# Code blocks are kept whole up to this multiple of the chunk size
+MAX_CODE_CHUNK_RATIO = 3
+
+
+def is_monospace(span: Dict[str, Any]) -> bool:
+    return bool(span["flags"] & MONOSPACE_FLAG) or any(name in span["font"].lower() for name in MONOSPACE_FONTS)
+
+
+def line_text(line: Dict[str, Any]) -> str:
+    return "".join(span["text"] for span in line["spans"]).rstrip()
+
+
+def boilerplate_key(text: str) -> str:
+    # Page numbers and dates differ between pages of the same running header
+    return re.sub(r"\d+", "#", text.strip())
+
+
+class DocumentProfile:
+    """Font statistics of a PDF: body text size, heading levels by size, and running headers and footers."""
+
+    def __init__(self, pdf: "fitz.Document"):
+        lines = []
+        line_pages: Counter = Counter()
+        for page in pdf:
+            seen = set()
+            for block in page.get_text("dict")["blocks"]:
+                for line in block.get("lines", []):
+                    spans = [span for span in line["spans"] if span["text"].strip()]
+                    # Repeated code lines such as imports are content, not page furniture
+                    if spans and not any(is_monospace(span) for span in spans):
+                        key = boilerplate_key(line_text(line))
+                        lines.append((key, spans))
+                        seen.add(key)
+            line_pages.update(seen)
+
+        threshold = max(3, BOILERPLATE_PAGE_RATIO * len(pdf))
+        self.boilerplate = {key for key, count in line_pages.items() if key and count >= threshold}
+        sizes: Counter = Counter()
+        prose_sizes: Counter = Counter()
+        for key, spans in lines:
+            if key in self.boilerplate:
+                continue
+            for span in spans:
+                sizes[round(span["size"], 1)] += len(span["text"])
+                # Headings are short and unpunctuated, so sentences and wrapped lines give the body size
+                if len(key) >= PROSE_LINE_LENGTH or key.endswith(PROSE_ENDINGS):
+                    prose_sizes[round(span["size"], 1)] += len(span["text"])
+
+        body_sizes = prose_sizes or sizes
+        self.body_size = body_sizes.most_common(1)[0][0] if body_sizes else 0.0
+        heading_sizes = sorted(
+            (size for size in sizes if size >= self.body_size * HEADING_SIZE_RATIO), reverse=True
+        )
+        self.heading_levels = {size: level for level, size in enumerate(heading_sizes, start=1)}
+
+    def heading_level(self, spans: List[Dict[str, Any]], text: str) -> Optional[int]:
+        """Returns the heading level of a block from its font size, or from bold body text, else None."""
+        if not text or len(text) > MAX_HEADING_LENGTH or TOC_ENTRY.search(text):
+            return None
+        if any(is_monospace(span) for span in spans):
+            return None
+        size = max(round(span["size"], 1) for span in spans)
+        if size in self.heading_levels:
+            return self.heading_levels[size]
+        if all(span["flags"] & BOLD_FLAG for span in spans) and size >= self.body_size and not text.endswith("."):
+            return len(self.heading_levels) + 1
+        return None
+
+
+def iter_elements(pdf: "fitz.Document", profile: DocumentProfile) -> Iterator[Tuple[str, str, int, int]]:
+    """
+    Yields (kind, text, page, level) elements in reading order.
+
+    Kind is "heading", "text" or "code"; consecutive monospace blocks are merged into a
+    single code element, including across page breaks, and boilerplate lines are dropped.
+    """
+    code_lines: List[str] = []
+    code_page = 0
+    for page_number, page in enumerate(pdf):
+        for block in page.get_text("dict")["blocks"]:
+            lines = [line for line in block.get("lines", []) if line_text(line).strip()]
+            spans = [span for line in lines for span in line["spans"] if span["text"].strip()]
+            if spans and all(is_monospace(span) for span in spans):
+                if not code_lines:
+                    code_page = page_number
+                code_lines.extend(line_text(line) for line in lines)
+                continue
+
+            lines = [line for line in lines if boilerplate_key(line_text(line)) not in profile.boilerplate]
+            if not lines:
+                continue
+            spans = [span for line in lines for span in line["spans"] if span["text"].strip()]
+            if code_lines:
+                yield "code", "\n".join(code_lines), code_page, 0
+                code_lines = []
+            text = "\n".join(line_text(line).strip() for line in lines)
+            level = profile.heading_level(spans, " ".join(text.split()))
+            if level is not None:
+                yield "heading", " ".join(text.split()), page_number, level
+            else:
+                yield "text", text, page_number, 0
+    if code_lines:
+        yield "code", "\n".join(code_lines), code_page, 0
+
+
+class StructuredChunker:
+    """
+    Splits a PDF along its structure using PyMuPDF block, font and heading information.
+
+    Chunks never cross a section boundary, code blocks are kept whole (up to
+    MAX_CODE_CHUNK_RATIO times the chunk size), and every chunk is prefixed with its
+    section path and carries section_path, pages and a parent_id shared by the chunks
+    of its section.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 0):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.code_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size * MAX_CODE_CHUNK_RATIO, chunk_overlap=0, separators=["\n\n", "\n", " "]
+        )
+
+    def overlap_tail(self, parts: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Returns the end of the chunk's prose, cut at a word boundary, to seed the next chunk."""
+        if not self.chunk_overlap:
+            return []
+        text = "\n".join(part for kind, part in parts if kind == "text")[-self.chunk_overlap :]
+        text = text.split(" ", 1)[-1] if " " in text else text
+        return [("text", text)] if text.strip() else []
+
+    def iter_documents(self, pdf_path: str) -> Iterator[Document]:
+        pdf = fitz.open(pdf_path)
+        profile = DocumentProfile(pdf)
+        base_metadata = {"source": pdf_path, "file_path": pdf_path, "total_pages": len(pdf)}
+
+        sections: List[Tuple[int, str]] = []
+        parts: List[Tuple[str, str]] = []
+        pages: List[int] = []
+
+        def build(chunk_parts, chunk_pages) -> Optional[Document]:
+            body = "\n".join(part for _, part in chunk_parts).strip()
+            if not body:
+                return None
+            section_path = " > ".join(title for _, title in sections)
+            kinds = {kind for kind, _ in chunk_parts}
+            metadata = {
+                **base_metadata,
+                "page": chunk_pages[0],
+                "pages": sorted(set(chunk_pages)),
+                "section": sections[-1][1] if sections else "",
+                "section_path": section_path,
+                "parent_id": str(uuid.uuid5(SECTION_ID_NAMESPACE, f"{os.path.basename(pdf_path)}\x00{section_path}")),
+                "chunk_type": kinds.pop() if len(kinds) == 1 else "mixed",
+            }
+            content = f"{section_path}\n{body}" if section_path else body
+            return Document(page_content=content, metadata=metadata)
+
+        def size(chunk_parts) -> int:
+            return sum(len(part) + 1 for _, part in chunk_parts)
+
+        for kind, text, page, level in iter_elements(pdf, profile):
+            if kind == "heading":
+                doc = build(parts, pages)
+                if doc:
+                    yield doc
+                parts, pages = [], []
+                while sections and sections[-1][0] >= level:
+                    sections.pop()
+                sections.append((level, text))
+                continue
+
+            pieces = [text]
+            if kind == "code" and len(text) > self.chunk_size * MAX_CODE_CHUNK_RATIO:
+                pieces = self.code_splitter.split_text(text)
+            elif kind == "text" and len(text) > self.chunk_size:
+                pieces = self.text_splitter.split_text(text)
+
+            for piece in pieces:
+                if parts and size(parts) + len(piece) > self.chunk_size:
+                    doc = build(parts, pages)
+                    if doc:
+                        yield doc
+                    parts = self.overlap_tail(parts) if kind == "text" else []
+                    pages = [pages[-1]] if parts else []
+                parts.append((kind, piece))
+                pages.append(page)
+
+        doc = build(parts, pages)
+        if doc:
+            yield doc
+        pdf.close()
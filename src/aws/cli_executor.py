@@ -0,0 +1,361 @@
+import asyncio
+import datetime
+import json
+import os
+import shlex
+import subprocess
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import jmespath
+from botocore import xform_name
+from botocore.exceptions import BotoCoreError, ClientError, ParamValidationError
+from botocore.utils import merge_dicts, set_value_from_jmespath
+
+from src.aws.context import get_aws_profile, get_aws_region
+from src.model.cache import LRUCache
+from src.model.config import (
+    CLI_ACCOUNT_TTL,
+    CLI_CACHE_SIZE,
+    CLI_CACHE_TTL,
+    CLI_MAX_CONCURRENCY,
+    CLI_MAX_ITEMS,
+    CLI_TIMEOUT,
+)
+from src.model.tracing import annotate, span
+
+if TYPE_CHECKING:
+    import boto3
+
+# Operations with these prefixes do not change state and are safe to run in-process and cache
+READ_ONLY_PREFIXES = ("describe-", "list-", "get-")
+
+# CLI command names that differ from the boto3 service name
+CLI_SERVICE_NAMES = {"s3api": "s3", "configservice": "config"}
+
+# Any of these means the command needs a real shell
+SHELL_METACHARACTERS = ("|", ">", "<", "&&", ";", "$(", "`")
+
+SCALAR_TYPES = ("string", "integer", "long", "float", "double", "boolean", "timestamp")
+
+# --output formats the in-process path reproduces; text, table and yaml are left to the CLI
+IN_PROCESS_OUTPUTS = (None, "json")
+
+
+class UnsupportedCommand(Exception):
+    """Raised when a command cannot be translated to a boto3 call and must run in a subprocess."""
+
+
+def convert_scalar(value: str, shape) -> Any:
+    if shape.type_name in ("integer", "long"):
+        return int(value)
+    if shape.type_name in ("float", "double"):
+        return float(value)
+    if shape.type_name == "boolean":
+        return value.lower() == "true"
+    return value
+
+
+def parse_shorthand(value: str, shape) -> Dict[str, Any]:
+    """Parses flat Key=Value,Key=Value shorthand into a structure with scalar members."""
+    if shape.type_name != "structure" or any(char in value for char in "[]{}"):
+        raise UnsupportedCommand(value)
+    members = {xform_name(name, "-").lower(): (name, member) for name, member in shape.members.items()}
+    members.update({name.lower(): (name, member) for name, member in shape.members.items()})
+    result = {}
+    for pair in value.split(","):
+        key, _, item = pair.partition("=")
+        name, member = members.get(key.strip().lower(), (None, None))
+        if name is None or member.type_name not in SCALAR_TYPES:
+            raise UnsupportedCommand(value)
+        result[name] = convert_scalar(item.strip(), member)
+    return result
+
+
+def convert_argument(values: List[str], shape) -> Any:
+    """Converts CLI argument values to the parameter type described by the botocore shape."""
+    if shape.type_name == "boolean":
+        return True if not values else values[0].lower() == "true"
+    if not values:
+        raise UnsupportedCommand("missing value")
+    if values[0].lstrip().startswith(("{", "[")):
+        return json.loads(" ".join(values))
+    if shape.type_name in SCALAR_TYPES:
+        return convert_scalar(values[0], shape)
+    if shape.type_name == "list":
+        member = shape.member
+        if member.type_name in SCALAR_TYPES:
+            return [convert_scalar(value, member) for value in values]
+        return [parse_shorthand(value, member) for value in values]
+    if shape.type_name == "structure":
+        return parse_shorthand(values[0], shape)
+    raise UnsupportedCommand(shape.type_name)
+
+
+def json_default(value: Any) -> Any:
+    """Serializes botocore values the way the CLI prints them, datetimes as ISO 8601."""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def collect_pages(pages, max_items: int) -> Dict[str, Any]:
+    """
+    Merges paginated responses like PageIterator.build_full_result, but stops requesting pages
+    once max_items items have been collected. A truncated result carries the CLI's NextToken.
+    """
+    result: Dict[str, Any] = {}
+    items = 0
+    for page in pages:
+        for expression in pages.result_keys:
+            value = expression.search(page)
+            if value is None:
+                continue
+            existing = expression.search(result)
+            if existing is None:
+                set_value_from_jmespath(result, expression.expression, value)
+            elif isinstance(value, list):
+                existing.extend(value)
+            elif isinstance(value, (int, float, str)):
+                set_value_from_jmespath(result, expression.expression, existing + value)
+        primary = pages.result_keys[0].search(page)
+        items += len(primary) if isinstance(primary, list) else 0
+        if items >= max_items:
+            break
+    merge_dicts(result, pages.non_aggregate_part)
+    if pages.resume_token is not None:
+        result["NextToken"] = pages.resume_token
+    return result
+
+
+class ParsedCommand:
+    def __init__(self, service: str, operation: str, arguments: Dict[str, List[str]], options: Dict[str, Any]):
+        self.service = service
+        self.operation = operation
+        self.arguments = arguments
+        self.options = options
+
+    @property
+    def read_only(self) -> bool:
+        return self.operation.startswith(READ_ONLY_PREFIXES)
+
+    @property
+    def profile(self) -> Optional[str]:
+        return self.options.get("profile") or get_aws_profile()
+
+    @property
+    def region(self) -> Optional[str]:
+        return self.options.get("region") or get_aws_region()
+
+
+def parse_cli_command(cli_command: str) -> ParsedCommand:
+    """Splits an `aws <service> <operation> --arg value ...` command into its parts."""
+    if any(char in cli_command for char in SHELL_METACHARACTERS):
+        raise UnsupportedCommand("shell syntax")
+    tokens = shlex.split(cli_command)
+    if len(tokens) < 3 or tokens[0] != "aws":
+        raise UnsupportedCommand("not an aws command")
+
+    positional, arguments, options = [], {}, {}
+    index = 1
+    while index < len(tokens):
+        token = tokens[index]
+        index += 1
+        if not token.startswith("--"):
+            positional.append(token)
+            continue
+        values = []
+        while index < len(tokens) and not tokens[index].startswith("--"):
+            values.append(tokens[index])
+            index += 1
+        name = token[2:]
+        if name in ("region", "profile", "output", "query", "max-items", "page-size"):
+            options[name] = values[0] if values else None
+            if name == "output" and options[name] not in IN_PROCESS_OUTPUTS:
+                raise UnsupportedCommand(f"--output {options[name]}")
+        elif name in ("no-paginate", "no-cli-pager", "no-cli-auto-prompt"):
+            options[name] = True
+        elif name in ("debug", "endpoint-url", "cli-input-json", "cli-input-yaml", "generate-cli-skeleton"):
+            raise UnsupportedCommand(name)
+        else:
+            arguments[name] = values
+
+    if len(positional) != 2:
+        raise UnsupportedCommand("expected a service and an operation")
+    return ParsedCommand(positional[0], positional[1], arguments, options)
+
+
+class AwsCliExecutor:
+    """
+    Executes AWS CLI commands, running read-only operations in-process through boto3.
+
+    Sessions and clients are pooled per profile, region and service, results of read-only
+    calls are cached for a short TTL keyed by account, region and normalized arguments,
+    and paginated operations are consumed page by page up to a maximum item count.
+    Commands that cannot be translated, that change state or that ask for text, table or
+    yaml output run in a subprocess.
+    """
+
+    def __init__(
+        self,
+        cache_ttl: float = CLI_CACHE_TTL,
+        cache_size: int = CLI_CACHE_SIZE,
+        max_concurrency: int = CLI_MAX_CONCURRENCY,
+    ):
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
+        self._sessions: Dict[Optional[str], "boto3.session.Session"] = {}
+        self._clients: Dict[Tuple[Optional[str], str, str], Any] = {}
+        self._accounts = LRUCache(maxsize=64, ttl=CLI_ACCOUNT_TTL)
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def session(self, profile: Optional[str]) -> "boto3.session.Session":
+        with self._lock:
+            if profile not in self._sessions:
+                # boto3 is imported on the first in-process command rather than at startup
+                import boto3
+
+                self._sessions[profile] = boto3.session.Session(profile_name=profile)
+            return self._sessions[profile]
+
+    def region(self, profile: Optional[str], region: Optional[str]) -> str:
+        return region or self.session(profile).region_name or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+
+    def client(self, profile: Optional[str], region: str, service: str):
+        key = (profile, region, service)
+        client = self._clients.get(key)
+        if client is None:
+            session = self.session(profile)
+            # Sessions are not thread-safe, clients are
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = session.client(service, region_name=region)
+        return client
+
+    def account(self, profile: Optional[str], region: str) -> str:
+        """Returns the profile's account id, looked up again after CLI_ACCOUNT_TTL as credentials can change."""
+        account = self._accounts.get(profile)
+        if account is None:
+            try:
+                account = self.client(profile, region, "sts").get_caller_identity()["Account"]
+                self._accounts.set(profile, account)
+            except (BotoCoreError, ClientError):
+                # Retried once the result cache entries keyed by it have expired
+                account = profile or "default"
+                self._accounts.set(profile, account, ttl=CLI_CACHE_TTL)
+        return account
+
+    def build_call(self, command: ParsedCommand) -> Tuple[Any, str, Dict[str, Any]]:
+        profile = command.profile
+        region = self.region(profile, command.region)
+        service = CLI_SERVICE_NAMES.get(command.service, command.service)
+        try:
+            client = self.client(profile, region, service)
+        except BotoCoreError as e:
+            raise UnsupportedCommand(str(e))
+
+        method = command.operation.replace("-", "_")
+        if method not in client.meta.method_to_api_mapping:
+            raise UnsupportedCommand(f"{command.service} {command.operation}")
+        operation_model = client.meta.service_model.operation_model(client.meta.method_to_api_mapping[method])
+
+        members = {}
+        if operation_model.input_shape is not None:
+            members = {xform_name(name, "-"): (name, shape) for name, shape in operation_model.input_shape.members.items()}
+
+        params = {}
+        for argument, values in command.arguments.items():
+            negated = argument.startswith("no-") and argument[3:] in members
+            name, shape = members.get(argument[3:] if negated else argument, (None, None))
+            if name is None:
+                raise UnsupportedCommand(argument)
+            params[name] = False if negated else convert_argument(values, shape)
+        return client, method, params
+
+    def call(self, client, method: str, params: Dict[str, Any], command: ParsedCommand) -> Any:
+        options = command.options
+        max_items = int(options.get("max-items") or CLI_MAX_ITEMS)
+        if client.can_paginate(method) and not options.get("no-paginate"):
+            pagination = {"MaxItems": max_items}
+            if options.get("page-size"):
+                pagination["PageSize"] = int(options["page-size"])
+            pages = client.get_paginator(method).paginate(**params, PaginationConfig=pagination)
+            result = collect_pages(pages, max_items)
+        else:
+            result = getattr(client, method)(**params)
+        if isinstance(result, dict):
+            result.pop("ResponseMetadata", None)
+        # Like the CLI, --query applies to the whole result rather than to each page
+        if options.get("query"):
+            result = jmespath.search(options["query"], result)
+        # Round-trip through JSON so datetimes and other botocore types match the CLI output
+        return json.loads(json.dumps(result, default=json_default))
+
+    def run_in_process(self, command: ParsedCommand) -> Any:
+        client, method, params = self.build_call(command)
+        profile = command.profile
+        region = client.meta.region_name
+        key = (
+            self.account(profile, region),
+            region,
+            command.service,
+            command.operation,
+            json.dumps(params, sort_keys=True, default=str),
+            command.options.get("query"),
+            command.options.get("max-items"),
+        )
+        result = self.cache.get(key)
+        annotate(mode="in_process", cache_hit=result is not None)
+        if result is None:
+            try:
+                result = self.call(client, method, params, command)
+            except ClientError as e:
+                error = e.response.get("Error", {})
+                return (
+                    f"An error occurred ({error.get('Code')}) when calling the "
+                    f"{e.operation_name} operation: {error.get('Message')}"
+                )
+            self.cache.set(key, result)
+        return result
+
+    def run_subprocess(self, cli_command: str) -> str:
+        annotate(mode="subprocess")
+        env = dict(os.environ)
+        if get_aws_profile():
+            env["AWS_PROFILE"] = get_aws_profile()
+        if get_aws_region():
+            env["AWS_REGION"] = env["AWS_DEFAULT_REGION"] = get_aws_region()
+        try:
+            completed = subprocess.run(
+                cli_command, shell=True, capture_output=True, text=True, timeout=CLI_TIMEOUT, env=env
+            )
+        except subprocess.TimeoutExpired:
+            return f"error: command timed out after {CLI_TIMEOUT} seconds"
+        return completed.stdout + completed.stderr
+
+    def run(self, cli_command: str) -> Any:
+        """Runs the command and returns parsed JSON for in-process calls, or the raw CLI output."""
+        with self._semaphore, span("aws_cli", "tool", command=cli_command[:200]) as item:
+            try:
+                command = parse_cli_command(cli_command)
+                if command.read_only:
+                    result = self.run_in_process(command)
+                    item.set(bytes=len(json.dumps(result, default=str)))
+                    return result
+            except (UnsupportedCommand, ParamValidationError, ValueError):
+                pass
+            except BotoCoreError as e:
+                # Missing credentials, unknown profiles and connection failures go back to the agent as the CLI reports them
+                result = f"error: {e}"
+                item.set(error=type(e).__name__)
+                return result
+            result = self.run_subprocess(cli_command)
+            item.set(bytes=len(result))
+            return result
+
+    async def arun(self, cli_command: str) -> Any:
+        return await asyncio.to_thread(self.run, cli_command)
+
+
+aws_cli_executor = AwsCliExecutor()
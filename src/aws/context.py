@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+DEFAULT_SESSION_ID = "default"
+
+# The chat session a request belongs to, so tools can namespace per-session state
+session_id_var: ContextVar[str] = ContextVar("session_id", default=DEFAULT_SESSION_ID)
+
+
+def get_session_id() -> str:
+    return session_id_var.get()
+
+
+@contextmanager
+def session_scope(session_id: Optional[str]) -> Iterator[str]:
+    """Binds the session id for the duration of one agent invocation."""
+    token = session_id_var.set(session_id or DEFAULT_SESSION_ID)
+    try:
+        yield session_id_var.get()
+    finally:
+        session_id_var.reset(token)
+
+
+# AWS profile and region for the request's CLI commands when the command does not pass
+# --profile or --region, so one process can audit several accounts concurrently
+aws_profile_var: ContextVar[Optional[str]] = ContextVar("aws_profile", default=None)
+aws_region_var: ContextVar[Optional[str]] = ContextVar("aws_region", default=None)
+
+
+def get_aws_profile() -> Optional[str]:
+    return aws_profile_var.get()
+
+
+def get_aws_region() -> Optional[str]:
+    return aws_region_var.get()
+
+
+@contextmanager
+def aws_scope(profile: Optional[str] = None, region: Optional[str] = None) -> Iterator[None]:
+    """Binds the default AWS profile and region for the duration of one agent invocation."""
+    profile_token = aws_profile_var.set(profile)
+    region_token = aws_region_var.set(region)
+    try:
+        yield
+    finally:
+        aws_profile_var.reset(profile_token)
+        aws_region_var.reset(region_token)
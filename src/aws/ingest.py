@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from langchain_core.documents import Document
+
+from src.model.config import (
+    CACHE_DIR,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    CHUNKER,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_STORAGE,
+    INGEST_BATCH_SIZE,
+    INGEST_WORKERS,
+)
+from src.model.embedding import get_text_embedding_model
+from src.model.registry import get_supabase_client
+from src.model.throttle import call_with_backoff
+
+# Document table -> source PDF
+CORPORA = {
+    "diagrams_documents": "./src/docs/diagrams_documentation.pdf",
+    "aws_documents": "./src/docs/aws_documentation.pdf",
+    "web_service_documents": "./src/docs/web_service_documentation.pdf",
+}
+
+INGEST_MANIFEST_PATH = os.path.join(CACHE_DIR, "ingest_manifest.json")
+
+# Embedding configuration of tables ingested before it was recorded in the manifest
+LEGACY_EMBEDDING = {"dimensions": 1024, "storage": "vector"}
+
+# Namespace for content-hash chunk ids, so the same chunk always maps to the same uuid
+CHUNK_ID_NAMESPACE = uuid.UUID("5b0b3d4e-6f0c-4a55-9d0e-3c1f2a7e8b90")
+
+
+def chunk_id(table_name: str, doc: Document) -> str:
+    """Returns a deterministic uuid for a chunk from its table, source file and content."""
+    source = os.path.basename(str(doc.metadata.get("source", "")))
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{table_name}\x00{source}\x00{doc.page_content}"))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest() -> Dict[str, Any]:
+    if not os.path.exists(INGEST_MANIFEST_PATH):
+        return {}
+    with open(INGEST_MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(INGEST_MANIFEST_PATH), exist_ok=True)
+    tmp_path = INGEST_MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, INGEST_MANIFEST_PATH)
+
+
+_manifest_snapshot = (None, {})
+
+
+def corpus_version(table_name: str) -> Optional[str]:
+    """
+    Returns an identifier that changes whenever seed_text re-ingests the table.
+
+    The manifest is only re-read when its mtime changes, so this is cheap to call per query.
+    """
+    global _manifest_snapshot
+    try:
+        mtime = os.stat(INGEST_MANIFEST_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifest_snapshot[0] != mtime:
+        _manifest_snapshot = (mtime, load_manifest())
+    entry = _manifest_snapshot[1].get(table_name)
+    return f"{entry['sha256']}:{entry['ingested_at']}" if entry else None
+
+
+def chunking_config(
+    chunker: str = CHUNKER, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP
+) -> Dict[str, Any]:
+    return {"chunker": chunker, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+
+def embedding_config(dimensions: int = EMBEDDING_DIMENSIONS, storage: str = EMBEDDING_STORAGE) -> Dict[str, Any]:
+    return {"dimensions": dimensions, "storage": storage}
+
+
+def iter_chunks(
+    pdf_path: str, chunker: str = CHUNKER, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP
+) -> Iterator[Document]:
+    """
+    Yields the PDF's chunks.
+
+    Args:
+    pdf_path (str): The PDF to chunk.
+    chunker (str): "structured" splits along headings and keeps code blocks whole, "character"
+        splits each page on blank lines without loading the whole document.
+    chunk_size (int): Target chunk size in characters.
+    chunk_overlap (int): Characters of prose repeated at the start of the next chunk.
+
+    Returns:
+    Iterator[Document]: The chunks, with the source page in metadata["page"].
+    """
+    # The PDF parsers are imported here so only ingestion and snapshots pay for them
+    if chunker == "structured":
+        from src.aws.chunking import StructuredChunker
+
+        yield from StructuredChunker(chunk_size, chunk_overlap).iter_documents(pdf_path)
+    elif chunker == "character":
+        from langchain_community.document_loaders import PyMuPDFLoader
+        from langchain_text_splitters import CharacterTextSplitter
+
+        text_splitter = CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        for page in PyMuPDFLoader(pdf_path).lazy_load():
+            yield from text_splitter.split_documents([page])
+    else:
+        raise ValueError(f"Unknown chunker: {chunker}")
+
+
+def fetch_embedding_dimensions(table_name: str, page_size: int = 1000) -> Dict[str, int]:
+    """Returns the size of every stored embedding of the table by row id."""
+    dimensions: Dict[str, int] = {}
+    start = 0
+    while True:
+        res = (
+            get_supabase_client()
+            .rpc("document_embedding_dimensions", {"table_name": table_name})
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        dimensions.update((row["id"], row["dimensions"]) for row in res.data)
+        if len(res.data) < page_size:
+            return dimensions
+        start += page_size
+
+
+def upsert_rows(table_name: str, rows: List[Dict[str, Any]]) -> None:
+    if rows:
+        call_with_backoff(lambda: get_supabase_client().table(table_name).upsert(rows).execute())
+
+
+def delete_rows(table_name: str, ids: List[str], batch_size: int = 200) -> None:
+    for start in range(0, len(ids), batch_size):
+        get_supabase_client().table(table_name).delete().in_("id", ids[start : start + batch_size]).execute()
+
+
+def drop_embedding_index(table_name: str) -> None:
+    get_supabase_client().rpc("drop_embedding_index", {"table_name": table_name}).execute()
+
+
+def create_embedding_index(table_name: str, embedding: Dict[str, Any]) -> None:
+    get_supabase_client().rpc("create_embedding_index", {"table_name": table_name, **embedding}).execute()
+
+
+def ingest_corpus(
+    table_name: str,
+    pdf_path: str,
+    workers: int = INGEST_WORKERS,
+    batch_size: int = INGEST_BATCH_SIZE,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    Incrementally ingests a PDF into a document table.
+
+    Chunks are identified by a hash of their content, so only new or changed chunks are
+    embedded, and chunks that disappeared from the PDF are deleted. Embeddings are computed
+    concurrently with throttling backoff and upserted in batches as they complete; every
+    committed batch acts as a checkpoint, so a crashed run resumes where it stopped.
+
+    A change of EMBEDDING_DIMENSIONS re-embeds in place every chunk stored at another size, so
+    an interrupted migration only redoes the rows it had not reached, and a change of
+    EMBEDDING_DIMENSIONS or EMBEDDING_STORAGE rebuilds the table's HNSW index. The index is
+    dropped first, so queries scan the rows of the new size exactly until it is rebuilt.
+    """
+    manifest = load_manifest()
+    source_hash = file_sha256(pdf_path)
+    chunking = chunking_config()
+    embedding = embedding_config()
+    entry = manifest.get(table_name, {})
+    previous_embedding = entry.get("embedding", LEGACY_EMBEDDING)
+    # A chunking change re-splits the PDF; chunks whose content is unchanged keep their ids and embeddings
+    if (
+        not force
+        and entry.get("sha256") == source_hash
+        and entry.get("chunking") == chunking
+        and previous_embedding == embedding
+    ):
+        print(f"{table_name}: {pdf_path} unchanged, skipping")
+        return {"embedded": 0, "skipped": manifest[table_name].get("chunks", 0), "deleted": 0}
+
+    reindex = previous_embedding != embedding
+    if reindex:
+        # The manifest keeps the previous configuration until the end, so an interrupted migration is redone
+        drop_embedding_index(table_name)
+
+    embeddings = get_text_embedding_model()
+    existing_dimensions = fetch_embedding_dimensions(table_name)
+    existing_ids = set(existing_dimensions)
+    # Rows embedded at another size are re-embedded under the same ids
+    reusable_ids = {
+        doc_id for doc_id, dimensions in existing_dimensions.items() if dimensions == embedding["dimensions"]
+    }
+    seen_ids: Set[str] = set()
+    rows: List[Dict[str, Any]] = []
+    stats = {"embedded": 0, "skipped": 0, "deleted": 0}
+
+    def embed_chunk(doc_id: str, doc: Document) -> Dict[str, Any]:
+        vector = call_with_backoff(embeddings.embed_documents, [doc.page_content])[0]
+        return {"id": doc_id, "content": doc.page_content, "embedding": vector, "metadata": doc.metadata}
+
+    def drain(pending, return_when) -> set:
+        done, pending = wait(pending, return_when=return_when)
+        for future in done:
+            rows.append(future.result())
+            stats["embedded"] += 1
+            if len(rows) >= batch_size:
+                upsert_rows(table_name, rows)
+                rows.clear()
+        return pending
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for doc in iter_chunks(pdf_path):
+            doc_id = chunk_id(table_name, doc)
+            if doc_id in seen_ids:
+                continue
+            seen_ids.add(doc_id)
+            if doc_id in reusable_ids:
+                stats["skipped"] += 1
+                continue
+            pending.add(executor.submit(embed_chunk, doc_id, doc))
+            # Bound the number of in-flight chunks so parsing stays lazy
+            if len(pending) >= workers * 2:
+                pending = drain(pending, FIRST_COMPLETED)
+        drain(pending, ALL_COMPLETED)
+    upsert_rows(table_name, rows)
+
+    stale_ids = sorted(existing_ids - seen_ids)
+    delete_rows(table_name, stale_ids)
+    stats["deleted"] = len(stale_ids)
+    if reindex:
+        create_embedding_index(table_name, embedding)
+
+    manifest[table_name] = {
+        "source": pdf_path,
+        "sha256": source_hash,
+        "chunking": chunking,
+        "embedding": embedding,
+        "chunks": len(seen_ids),
+        "ingested_at": datetime.now(timezone.utc).isoformat(),
+    }
+    save_manifest(manifest)
+    print(f"{table_name}: {stats}")
+    return stats
+
+
+def ingest_all(**kwargs) -> Dict[str, Dict[str, int]]:
+    return {table_name: ingest_corpus(table_name, pdf_path, **kwargs) for table_name, pdf_path in CORPORA.items()}
@@ -0,0 +1,192 @@
+import asyncio
+import contextvars
+import itertools
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from src.aws import vectorstore
+from src.aws.answer_cache import answer_cache, answer_payload
+from src.aws.streaming import RAG_TOOL_TAG
+from src.model.config import KNOWLEDGE_CONTEXT_TOKENS, MATCH_COUNT
+from src.model.embedding import get_text_embedding_model
+from src.model.registry import get_llm
+from src.model.tokens import estimate_tokens
+from src.model.tracing import span
+
+TOOL_NAME = "aws_knowledge_tool"
+
+# Document table -> title its excerpts are cited by
+KNOWLEDGE_SOURCES = {
+    "aws_documents": "AWS Well-Architected Framework",
+    "web_service_documents": "Overview of Amazon Web Services",
+    "diagrams_documents": "diagrams library documentation",
+}
+
+# Answer cache key of answers built from all the tables
+KNOWLEDGE_TABLES = "+".join(KNOWLEDGE_SOURCES)
+
+KNOWLEDGE_PROMPT = PromptTemplate(
+    template="""
+        You are an AWS solutions architect. The context below holds numbered excerpts from the AWS
+        Well-Architected Framework (best practices), the AWS Whitepaper Overview of Amazon Web Services
+        (choosing services) and the documentation of the Python diagrams library (diagram code).
+
+        Answer every part of the question below from the context. Cite the excerpts that support each
+        statement by their numbers in square brackets, for example [2]. If the context does not cover a
+        part of the question, say so instead of guessing.
+        If the question asks for a diagram, include syntactically correct Python code for the diagrams
+        library in a single python code block, without license information or colab code.
+
+        Question:
+        {question}
+
+        Context:
+        {context}
+
+        Answer:
+        """,
+    input_variables=["context", "question"],
+)
+
+CITATION = re.compile(r"\[(\d+)\]")
+
+Result = Tuple[str, Document, float]
+
+
+@lru_cache(maxsize=None)
+def get_knowledge_chain():
+    return KNOWLEDGE_PROMPT | get_llm("knowledge") | StrOutputParser()
+
+
+def search_corpus(table_name: str, query: str, k: int = MATCH_COUNT) -> List[Result]:
+    with span("knowledge.search", table=table_name) as item:
+        store = vectorstore.get_document_vector_store(table_name)
+        results = store.similarity_search_with_relevance_scores(query, k=k)
+        item.set(rows=len(results))
+    return [(table_name, doc, score) for doc, score in results]
+
+
+def search_all(query: str) -> List[List[Result]]:
+    """Searches every table concurrently; each thread runs in a copy of the caller's context so spans nest."""
+    with ThreadPoolExecutor(max_workers=len(KNOWLEDGE_SOURCES)) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, search_corpus, table_name, query)
+            for table_name in KNOWLEDGE_SOURCES
+        ]
+        return [future.result() for future in futures]
+
+
+async def asearch_all(query: str) -> List[List[Result]]:
+    return list(
+        await asyncio.gather(*(asyncio.to_thread(search_corpus, table_name, query) for table_name in KNOWLEDGE_SOURCES))
+    )
+
+
+def merge_results(results: List[List[Result]], token_budget: int = KNOWLEDGE_CONTEXT_TOKENS) -> List[Result]:
+    """
+    Merges the per-table results into one context within the token budget.
+
+    Results are taken round-robin by rank, so every table is represented whatever the scale of its
+    scores, and excerpts whose whitespace-normalized text was already taken are dropped. An
+    excerpt that does not fit is skipped, so smaller ones further down may still be included.
+    """
+    seen = set()
+    merged: List[Result] = []
+    used = 0
+    for rank in itertools.zip_longest(*results):
+        for result in rank:
+            if result is None:
+                continue
+            text = " ".join(result[1].page_content.split()).lower()
+            tokens = estimate_tokens(result[1].page_content)
+            if text in seen or used + tokens > token_budget:
+                continue
+            seen.add(text)
+            merged.append(result)
+            used += tokens
+    return merged
+
+
+def source_label(table_name: str, doc: Document) -> str:
+    parts = [KNOWLEDGE_SOURCES[table_name]]
+    if doc.metadata.get("section_path"):
+        parts.append(doc.metadata["section_path"])
+    if doc.metadata.get("page") is not None:
+        parts.append(f"page {doc.metadata['page'] + 1}")
+    return ", ".join(parts)
+
+
+def format_context(results: List[Result]) -> str:
+    return "\n\n".join(
+        f"[{number}] {source_label(table_name, doc)}\n{doc.page_content}"
+        for number, (table_name, doc, _) in enumerate(results, start=1)
+    )
+
+
+def with_sources(answer: str, results: List[Result]) -> str:
+    """Appends the excerpts the answer cites, or all of them when it cites none, as a source list."""
+    cited = {int(number) for number in CITATION.findall(answer)}
+    numbers = [number for number in range(1, len(results) + 1) if number in cited] or range(1, len(results) + 1)
+    sources = "\n".join(f"[{number}] {source_label(results[number - 1][0], results[number - 1][1])}" for number in numbers)
+    return f"{answer.strip()}\n\nSources:\n{sources}" if sources else answer.strip()
+
+
+def build_response(query: str, answer: str, results: List[Result], query_vector: List[float]) -> Dict[str, Any]:
+    result = with_sources(answer, results)
+    source_documents = [doc for _, doc, _ in results]
+    answer_cache.store(
+        TOOL_NAME,
+        KNOWLEDGE_TABLES,
+        query_vector,
+        query=query,
+        result=result,
+        source_documents=source_documents,
+    )
+    return answer_payload(query, result, source_documents, cached=False)
+
+
+def answer_query(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    """
+    Answers a question from all the document tables with one generation.
+
+    The query is embedded once, before the tables are searched concurrently, so every store's
+    own embedding lookup is a cache hit. The merged, de-duplicated context is numbered and the
+    answer cites it, followed by the list of the cited sources.
+    """
+    query_vector = get_text_embedding_model().embed_query(query)
+    with span("answer_cache", tool=TOOL_NAME) as item:
+        cached = answer_cache.lookup(TOOL_NAME, KNOWLEDGE_TABLES, query_vector)
+        item.set(cache_hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    results = merge_results(search_all(query))
+    answer = get_knowledge_chain().invoke(
+        {"question": query, "context": format_context(results)},
+        config={"callbacks": callbacks, "tags": [RAG_TOOL_TAG]},
+    )
+    return build_response(query, answer, results, query_vector)
+
+
+async def aanswer_query(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    """Async counterpart of answer_query."""
+    query_vector = await get_text_embedding_model().aembed_query(query)
+    with span("answer_cache", tool=TOOL_NAME) as item:
+        cached = answer_cache.lookup(TOOL_NAME, KNOWLEDGE_TABLES, query_vector)
+        item.set(cache_hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    results = merge_results(await asearch_all(query))
+    answer = await get_knowledge_chain().ainvoke(
+        {"question": query, "context": format_context(results)},
+        config={"callbacks": callbacks, "tags": [RAG_TOOL_TAG]},
+    )
+    return build_response(query, answer, results, query_vector)
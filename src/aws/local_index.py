@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.aws.ingest import CORPORA, chunk_id, iter_chunks
+from src.aws.rerank import rerank
+from src.model.config import (
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_RESCORE_FACTOR,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_QUANTIZATION,
+    MATCH_COUNT,
+    RERANK_CANDIDATES,
+    RERANKER,
+)
+from src.model.embedding import get_text_embedding_model
+from src.model.registry import get_supabase_client
+
+QUANTIZATIONS = ("float32", "float16", "int8", "binary")
+
+# Set bits of every byte value, for hamming distances between packed binary vectors
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+# float16 rows are converted to float32 this many at a time when scoring
+SCORE_BLOCK_ROWS = 4096
+
+
+def quantize(vectors: np.ndarray, method: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Returns the stored matrix and, for int8, the per-row scales to dequantize it.
+
+    binary keeps the sign of each dimension packed 8 per byte, like pgvector's binary_quantize.
+    """
+    if method == "float32":
+        return vectors.astype(np.float32), None
+    if method == "float16":
+        return vectors.astype(np.float16), None
+    if method == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    if method == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    raise ValueError(f"Unknown quantization: {method}")
+
+
+def top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index over a snapshot of a document table.
+
+    Vectors are L2-normalized float32, float16, int8 or binary rows, usually memory-mapped
+    from disk, and top-k is a single vectorized dot product, so retrieval needs no network
+    round trip and no database. Binary rows are ranked by hamming distance, and the best
+    rescore_factor times k of them are re-ranked against the float32 vectors, which are only
+    read for those rows.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        matrix: np.ndarray,
+        records: List[Dict[str, Any]],
+        scales: Optional[np.ndarray] = None,
+        reranker: Optional[str] = RERANKER,
+        vectors: Optional[np.ndarray] = None,
+        rescore_factor: int = EMBEDDING_RESCORE_FACTOR,
+    ):
+        self._embedding = embedding
+        self.matrix = matrix
+        self.records = records
+        self.scales = scales
+        self.reranker = None if reranker == "none" else reranker
+        self.vectors = vectors
+        self.rescore_factor = rescore_factor
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def dimensions(self) -> int:
+        # Binary rows are packed 8 dimensions per byte, their float32 vectors keep the exact size
+        if self.vectors is not None:
+            return self.vectors.shape[1]
+        return self.matrix.shape[1] * (8 if self.matrix.dtype == np.uint8 else 1)
+
+    @classmethod
+    def from_vectors(
+        cls,
+        embedding: Embeddings,
+        vectors: List[List[float]],
+        records: List[Dict[str, Any]],
+        quantization: str = "float32",
+        **kwargs,
+    ) -> "LocalVectorStore":
+        if records:
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(len(records), -1)
+        else:
+            # reshape cannot infer the width of an empty table
+            vectors = np.empty((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        matrix, scales = quantize(vectors, quantization)
+        if quantization == "binary":
+            kwargs.setdefault("vectors", vectors)
+        return cls(embedding, matrix, records, scales, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs):
+        metadatas = metadatas or [{} for _ in texts]
+        ids = kwargs.pop("ids", None) or [str(i) for i in range(len(texts))]
+        records = [
+            {"id": doc_id, "content": text, "metadata": metadata}
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+        return cls.from_vectors(embedding, embedding.embed_documents(list(texts)), records, **kwargs)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs) -> List[str]:
+        raise RuntimeError("Local indexes are read-only snapshots; rebuild them with snapshot_text")
+
+    def save(self, table_name: str, directory: str = LOCAL_INDEX_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, f"{table_name}.npy"), self.matrix)
+        for suffix, array in (("scales", self.scales), ("vectors", self.vectors)):
+            path = os.path.join(directory, f"{table_name}.{suffix}.npy")
+            if array is not None:
+                np.save(path, array)
+            elif os.path.exists(path):
+                # Left over from a snapshot with another quantization
+                os.remove(path)
+        with open(os.path.join(directory, f"{table_name}.jsonl"), "w") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+
+    @classmethod
+    def load(cls, table_name: str, embedding: Embeddings, directory: str = LOCAL_INDEX_DIR) -> "LocalVectorStore":
+        matrix = np.load(os.path.join(directory, f"{table_name}.npy"), mmap_mode="r")
+        scales_path = os.path.join(directory, f"{table_name}.scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        vectors_path = os.path.join(directory, f"{table_name}.vectors.npy")
+        vectors = np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None
+        with open(os.path.join(directory, f"{table_name}.jsonl")) as f:
+            records = [json.loads(line) for line in f]
+        store = cls(embedding, matrix, records, scales, vectors=vectors)
+        if records and store.dimensions != EMBEDDING_DIMENSIONS:
+            raise ValueError(
+                f"Local index {table_name!r} in {directory} has {store.dimensions}-dimensional vectors but "
+                f"EMBEDDING_DIMENSIONS is {EMBEDDING_DIMENSIONS}, rebuild it with `poetry run snapshot_text`"
+            )
+        return store
+
+    def scores(self, query: List[float]) -> np.ndarray:
+        """Returns the similarity of every row to the query; approximate for binary rows."""
+        query = np.asarray(query, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        if self.matrix.dtype == np.uint8:
+            distances = POPCOUNT[np.bitwise_xor(self.matrix, np.packbits(query > 0))].sum(axis=1, dtype=np.int32)
+            return 1.0 - 2.0 * distances / len(query)
+        if self.matrix.dtype == np.float16:
+            return np.concatenate(
+                [
+                    self.matrix[start : start + SCORE_BLOCK_ROWS].astype(np.float32) @ query
+                    for start in range(0, len(self.matrix), SCORE_BLOCK_ROWS)
+                ]
+            )
+        if self.scales is None:
+            return self.matrix @ query
+        return (self.matrix @ query) * self.scales
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, query: List[float], k: int = MATCH_COUNT, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        if not self.records:
+            return []
+        scores = self.scores(query)
+        top = top_indices(scores, k if self.vectors is None else k * self.rescore_factor)
+        if self.vectors is not None:
+            # Sorted row order keeps reads from the memory-mapped vectors sequential
+            top = np.sort(top)
+            query = np.asarray(query, dtype=np.float32)
+            exact = self.vectors[top] @ (query / max(float(np.linalg.norm(query)), 1e-12))
+            order = top_indices(exact, k)
+            top, scores = top[order], dict(zip(top[order], exact[order]))
+        return [
+            (
+                Document(page_content=self.records[i]["content"], metadata=self.records[i]["metadata"]),
+                float(scores[i]),
+            )
+            for i in top
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = MATCH_COUNT, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search_with_relevance_scores(
+        self, query: str, k: int = MATCH_COUNT, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        candidates = k * RERANK_CANDIDATES if self.reranker else k
+        results = self.similarity_search_by_vector_with_relevance_scores(self._embedding.embed_query(query), candidates)
+        return rerank(query, results, self.reranker)[:k]
+
+    def similarity_search(self, query: str, k: int = MATCH_COUNT, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k)]
+
+
+@lru_cache(maxsize=None)
+def load_local_vector_store(table_name: str) -> LocalVectorStore:
+    return LocalVectorStore.load(table_name, get_text_embedding_model())
+
+
+def snapshot_from_supabase(table_name: str, page_size: int = 500) -> Tuple[List[List[float]], List[Dict[str, Any]]]:
+    vectors, records = [], []
+    start = 0
+    while True:
+        res = (
+            get_supabase_client().table(table_name)
+            .select("id, content, metadata, embedding")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        for row in res.data:
+            embedding = row["embedding"]
+            # PostgREST returns pgvector columns as their text representation
+            vectors.append(json.loads(embedding) if isinstance(embedding, str) else embedding)
+            records.append({"id": row["id"], "content": row["content"], "metadata": row["metadata"]})
+        if len(res.data) < page_size:
+            return vectors, records
+        start += page_size
+
+
+def snapshot_from_pdf(table_name: str) -> Tuple[List[List[float]], List[Dict[str, Any]]]:
+    docs = list(iter_chunks(CORPORA[table_name]))
+    vectors = get_text_embedding_model().embed_documents([doc.page_content for doc in docs])
+    records = [
+        {"id": chunk_id(table_name, doc), "content": doc.page_content, "metadata": doc.metadata} for doc in docs
+    ]
+    return vectors, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot the document tables into local vector indexes")
+    parser.add_argument("--source", choices=["supabase", "pdf"], default="supabase")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default=LOCAL_INDEX_QUANTIZATION)
+    args = parser.parse_args()
+
+    for table_name in CORPORA:
+        snapshot = snapshot_from_supabase if args.source == "supabase" else snapshot_from_pdf
+        vectors, records = snapshot(table_name)
+        store = LocalVectorStore.from_vectors(get_text_embedding_model(), vectors, records, args.quantization)
+        store.save(table_name)
+        print(f"{table_name}: {len(records)} vectors, {store.matrix.nbytes / 1024:.0f} KiB ({args.quantization})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,77 @@
 import sys
-from typing import Optional
-
-from src.aws.agent import construct_agent
-
-
-def search(query_term: Optional[str] = None, callbacks=None):
-    agent_executor = construct_agent()
-    config = {"recursion_limit": 25}
-    result = agent_executor.invoke(
-        {
-            "input": query_term,
-        },
-        config={
-            'callbacks': callbacks,
-            **config
-        }
-    )
+from typing import Any, Dict, Optional
+
+from src.aws.agent import get_agent_executor
+from src.aws.context import session_scope
+from src.aws.memory import get_memory
+from src.model.tracing import TracingCallbackHandler, span
+from src.model.usage import TokenUsageHandler
+
+SEARCH_CONFIG = {"recursion_limit": 25}
+
+
+def update_memory(memory, query_term: Optional[str], result: Dict[str, Any]) -> None:
+    """Records the turn; a failure is recorded on the span and never costs the user the answer."""
+    try:
+        with span("memory.update"):
+            memory.add_turn(query_term, result["output"], result["intermediate_steps"])
+    except Exception:
+        pass
+
+
+def search(query_term: Optional[str] = None, callbacks=None, session_id: Optional[str] = None):
+    usage = TokenUsageHandler()
+    with session_scope(session_id) as session_id, span("search", "request", session_id=session_id) as root:
+        agent_executor = get_agent_executor()
+        memory = get_memory(session_id)
+        result = agent_executor.invoke(
+            {
+                "input": query_term,
+                "chat_history": memory.render(),
+            },
+            config={
+                'callbacks': [*(callbacks or []), usage, TracingCallbackHandler()],
+                **SEARCH_CONFIG
+            }
+        )
+        update_memory(memory, query_term, result)
+    # Per-step token usage of the agent and RAG tool LLM calls, and the trace of this request
+    result["token_usage"] = usage.steps
+    result["trace_id"] = root.trace_id
+    return result
+
+
+async def asearch(query_term: Optional[str] = None, callbacks=None, session_id: Optional[str] = None):
+    """
+    Async counterpart of search, so one process can serve many sessions concurrently.
+
+    Tools run through their coroutine implementations, and independent tool calls the agent
+    writes in one step, see MultiActionReActOutputParser, run concurrently.
+    """
+    usage = TokenUsageHandler()
+    with session_scope(session_id) as session_id, span("search", "request", session_id=session_id) as root:
+        agent_executor = get_agent_executor()
+        memory = get_memory(session_id)
+        result = await agent_executor.ainvoke(
+            {
+                "input": query_term,
+                "chat_history": memory.render(),
+            },
+            config={
+                'callbacks': [*(callbacks or []), usage, TracingCallbackHandler()],
+                **SEARCH_CONFIG
+            }
+        )
+        update_memory(memory, query_term, result)
+    result["token_usage"] = usage.steps
+    result["trace_id"] = root.trace_id
     return result
 
 
 def main():
     # sys.argv[1] will be the first command-line argument passed to the script
     query = sys.argv[1] if len(sys.argv) > 1 else None
-    search(query)
+    print(search(query)["output"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,178 @@
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from src.model.cache import LRUCache
+from src.model.config import (
+    MEMORY_OBSERVATION_TOKENS,
+    MEMORY_RECENT_TURNS,
+    MEMORY_SESSIONS,
+    MEMORY_SUMMARY_TOKENS,
+    MEMORY_SUMMARY_WORKERS,
+    MEMORY_TOKEN_BUDGET,
+    MEMORY_TTL,
+)
+from src.model.registry import get_llm
+from src.model.tokens import estimate_tokens
+from src.model.tracing import span
+
+NO_HISTORY = "No previous conversation."
+
+# Summaries are generated off the request path, so answers are not delayed by the extra LLM call
+_summary_executor = ThreadPoolExecutor(max_workers=MEMORY_SUMMARY_WORKERS, thread_name_prefix="memory-summary")
+
+SUMMARY_PROMPT = PromptTemplate(
+    template="""
+        Progressively summarize the conversation between a customer and their AWS DevOps engineer,
+        adding the new turns to the existing summary.
+
+        Keep every concrete fact the engineer may need again: resource names and IDs, regions, costs,
+        counts, configuration values, commands that were run and what they returned, and decisions made.
+        Drop greetings and reasoning. Keep the summary under {max_words} words.
+
+        Current summary:
+        {summary}
+
+        New turns:
+        {turns}
+
+        New summary:
+        """,
+    input_variables=["summary", "turns", "max_words"],
+)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[: max_tokens * 4] + "...(truncated)"
+
+
+def format_observation(observation: Any) -> str:
+    """Renders a tool observation compactly, keeping only the answer of RAG tool responses."""
+    if isinstance(observation, dict):
+        response = observation.get("code")
+        if isinstance(response, dict) and "result" in response:
+            observation = response["result"]
+        else:
+            observation = json.dumps(observation, default=str)
+    return truncate_to_tokens(str(observation), MEMORY_OBSERVATION_TOKENS)
+
+
+def format_turn(turn: Dict[str, Any]) -> str:
+    lines = [f"Customer: {turn['input']}"]
+    for tool, tool_input, observation in turn["observations"]:
+        lines.append(f"Tool {tool} with input {tool_input} returned: {observation}")
+    lines.append(f"Engineer: {turn['output']}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    Conversation buffer for one chat session.
+
+    The last recent_turns turns, with their tool observations, are kept verbatim. Older turns
+    are folded into a running summary with the LLM whenever the rendered history exceeds
+    token_budget, so follow-up questions can reuse facts fetched earlier without calling the
+    tools again. Summaries run in the background, one at a time per session, and turns leave
+    the buffer only once a summary holding them was generated; after a failed summary they
+    are folded in with the next turn.
+    """
+
+    def __init__(
+        self,
+        recent_turns: int = MEMORY_RECENT_TURNS,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        summary_tokens: int = MEMORY_SUMMARY_TOKENS,
+    ):
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns: List[Dict[str, Any]] = []
+        self._summarizing = False
+        self._lock = threading.Lock()
+        self._summarizer = SUMMARY_PROMPT | get_llm("memory") | StrOutputParser()
+
+    def render(self) -> str:
+        """Returns the history for the agent prompt."""
+        with self._lock:
+            parts = []
+            if self.summary:
+                parts.append(f"Summary of earlier conversation:\n{self.summary}")
+            parts.extend(format_turn(turn) for turn in self.turns)
+        return "\n\n".join(parts) or NO_HISTORY
+
+    def _overflow(self) -> List[Dict[str, Any]]:
+        """Returns the oldest turns that no longer fit the recent window or the token budget; call with the lock held."""
+        count = 0
+        while len(self.turns) - count > 1 and (
+            len(self.turns) - count > self.recent_turns
+            or estimate_tokens(self.summary + "".join(map(format_turn, self.turns[count:]))) > self.token_budget
+        ):
+            count += 1
+        return self.turns[:count]
+
+    def _summary_inputs(self, overflow: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "summary": self.summary or "(empty)",
+            "turns": "\n\n".join(map(format_turn, overflow)),
+            "max_words": self.summary_tokens * 3 // 4,
+        }
+
+    def summarize(self, overflow: List[Dict[str, Any]], inputs: Dict[str, Any]) -> None:
+        """Folds the overflowing turns into the summary; errors are recorded on the span and the turns kept."""
+        try:
+            with span("memory.summarize", turns=len(overflow)):
+                summary = self._summarizer.invoke(inputs)
+            with self._lock:
+                self.summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+                # Only this task removes turns, so the summarized ones are still the oldest
+                del self.turns[: len(overflow)]
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._summarizing = False
+
+    def add_turn(self, query: str, output: str, intermediate_steps: List[Tuple[Any, Any]]) -> None:
+        """Appends a turn and, when the history overflows, starts summarizing it in the background."""
+        observations = [
+            (action.tool, action.tool_input, format_observation(observation))
+            for action, observation in intermediate_steps
+        ]
+        with self._lock:
+            self.turns.append({"input": query, "output": output, "observations": observations})
+            if self._summarizing:
+                return
+            overflow = self._overflow()
+            if not overflow:
+                return
+            self._summarizing = True
+            inputs = self._summary_inputs(overflow)
+        # Run in a copy of the caller's context so the summary span nests under the request
+        _summary_executor.submit(contextvars.copy_context().run, self.summarize, overflow, inputs)
+
+
+_memories = LRUCache(maxsize=MEMORY_SESSIONS, ttl=MEMORY_TTL)
+_memories_lock = threading.Lock()
+
+
+def get_memory(session_id: str) -> ConversationMemory:
+    """Returns the session's memory, creating it on first use; idle sessions expire after MEMORY_TTL."""
+    with _memories_lock:
+        memory: Optional[ConversationMemory] = _memories.get(session_id)
+        if memory is None:
+            memory = ConversationMemory()
+        # Re-setting refreshes the TTL so active conversations are not expired mid-session
+        _memories.set(session_id, memory)
+        return memory
+
+
+def clear_memory(session_id: str) -> None:
+    _memories.pop(session_id)
@@ -0,0 +1,46 @@
+import re
+from typing import List, Union
+
+from langchain.agents.agent import MultiActionAgentOutputParser
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain.agents.output_parsers.react_single_input import (
+    FINAL_ANSWER_ACTION,
+    FINAL_ANSWER_AND_PARSABLE_ACTION_ERROR_MESSAGE,
+)
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.exceptions import OutputParserException
+
+# One "Action:" line and its input, up to the next "Action:" line; "Action Input:" does not start a new one
+ACTION_BLOCK = re.compile(
+    r"^Action\s*\d*\s*:[ \t]*(.*?)[ \t]*\n\s*Action\s*\d*\s*Input\s*\d*\s*:(.*?)(?=^Action\s*\d*\s*:|\Z)",
+    re.DOTALL | re.MULTILINE,
+)
+
+
+class MultiActionReActOutputParser(MultiActionAgentOutputParser):
+    """
+    Parses ReAct output that may request several tool calls before the next observation.
+
+    Independent calls written one after another, each with its own Action and Action Input
+    lines, are returned together and AgentExecutor.ainvoke runs them concurrently. Output with
+    a single action, a final answer or a format error is parsed by ReActSingleInputOutputParser.
+    """
+
+    def parse(self, text: str) -> Union[List[AgentAction], AgentFinish]:
+        blocks = list(ACTION_BLOCK.finditer(text))
+        if len(blocks) < 2:
+            result = ReActSingleInputOutputParser().parse(text)
+            return [result] if isinstance(result, AgentAction) else result
+        if FINAL_ANSWER_ACTION in text:
+            raise OutputParserException(f"{FINAL_ANSWER_AND_PARSABLE_ACTION_ERROR_MESSAGE}: {text}")
+
+        actions = []
+        for index, block in enumerate(blocks):
+            # The first action's log keeps the thought, so the scratchpad reads as the model wrote it
+            log = (text[: block.end()] if index == 0 else block.group(0)).rstrip()
+            actions.append(AgentAction(block.group(1).strip(), block.group(2).strip().strip('"'), log))
+        return actions
+
+    @property
+    def _type(self) -> str:
+        return "react-multi-action"
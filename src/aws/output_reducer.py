@@ -0,0 +1,186 @@
+import json
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import jmespath
+
+from src.aws.cli_executor import UnsupportedCommand, parse_cli_command
+from src.model.cache import LRUCache
+from src.model.config import (
+    CLI_OUTPUT_COMPACT_THRESHOLD,
+    CLI_OUTPUT_TOKEN_BUDGET,
+    RESULT_STORE_SIZE,
+    RESULT_STORE_TTL,
+)
+from src.model.tokens import estimate_json_tokens
+from src.model.tracing import annotate
+
+# Per-operation JMESPath projections keeping only the fields useful to the agent
+PROJECTIONS = {
+    ("ec2", "describe-instances"): (
+        "Reservations[].Instances[].{InstanceId: InstanceId, Name: Tags[?Key=='Name'] | [0].Value, "
+        "InstanceType: InstanceType, State: State.Name, AvailabilityZone: Placement.AvailabilityZone, "
+        "PrivateIpAddress: PrivateIpAddress, PublicIpAddress: PublicIpAddress, LaunchTime: LaunchTime}"
+    ),
+    ("ec2", "describe-security-groups"): (
+        "SecurityGroups[].{GroupId: GroupId, GroupName: GroupName, VpcId: VpcId, "
+        "IngressRules: length(IpPermissions), EgressRules: length(IpPermissionsEgress)}"
+    ),
+    ("ec2", "describe-vpcs"): "Vpcs[].{VpcId: VpcId, CidrBlock: CidrBlock, IsDefault: IsDefault, State: State}",
+    ("ec2", "describe-subnets"): (
+        "Subnets[].{SubnetId: SubnetId, VpcId: VpcId, CidrBlock: CidrBlock, "
+        "AvailabilityZone: AvailabilityZone, AvailableIpAddressCount: AvailableIpAddressCount}"
+    ),
+    ("ec2", "describe-volumes"): (
+        "Volumes[].{VolumeId: VolumeId, Size: Size, VolumeType: VolumeType, State: State, "
+        "AvailabilityZone: AvailabilityZone}"
+    ),
+    ("s3api", "list-buckets"): "Buckets[].{Name: Name, CreationDate: CreationDate}",
+    ("lambda", "list-functions"): (
+        "Functions[].{FunctionName: FunctionName, Runtime: Runtime, MemorySize: MemorySize, "
+        "Timeout: Timeout, LastModified: LastModified}"
+    ),
+    ("rds", "describe-db-instances"): (
+        "DBInstances[].{DBInstanceIdentifier: DBInstanceIdentifier, Engine: Engine, "
+        "DBInstanceClass: DBInstanceClass, Status: DBInstanceStatus, MultiAZ: MultiAZ, "
+        "AllocatedStorage: AllocatedStorage}"
+    ),
+    ("iam", "list-users"): "Users[].{UserName: UserName, CreateDate: CreateDate, PasswordLastUsed: PasswordLastUsed}",
+    ("iam", "list-roles"): "Roles[].{RoleName: RoleName, CreateDate: CreateDate}",
+    ("cloudformation", "describe-stacks"): "Stacks[].{StackName: StackName, StackStatus: StackStatus, CreationTime: CreationTime}",
+    ("cloudwatch", "describe-alarms"): (
+        "MetricAlarms[].{AlarmName: AlarmName, StateValue: StateValue, MetricName: MetricName, Namespace: Namespace}"
+    ),
+    ("ce", "get-cost-and-usage"): (
+        "ResultsByTime[].{Start: TimePeriod.Start, End: TimePeriod.End, Total: Total, "
+        "Groups: Groups[].{Keys: Keys, Metrics: Metrics}}"
+    ),
+}
+
+# Starting limits for compaction; they are halved until the output fits the token budget
+MAX_ARRAY_ITEMS = 20
+SAMPLE_ITEMS = 5
+MAX_STRING_LENGTH = 400
+MAX_DISTINCT_VALUES = 10
+
+result_store = LRUCache(maxsize=RESULT_STORE_SIZE, ttl=RESULT_STORE_TTL)
+
+
+def summarize_array(items: List[Any]) -> Dict[str, Any]:
+    """Aggregates an array into value counts for low-cardinality fields and ranges for numeric ones."""
+    rows = [item for item in items if isinstance(item, dict)]
+    if not rows:
+        counts = Counter(json.dumps(item, default=str) for item in items)
+        return {"distinct": len(counts)}
+
+    summary = {}
+    for key in {key for row in rows for key in row}:
+        values = [row.get(key) for row in rows if row.get(key) is not None]
+        numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if numbers and len(numbers) == len(values):
+            summary[key] = {"min": min(numbers), "max": max(numbers), "sum": sum(numbers)}
+            continue
+        counts = Counter(value for value in values if isinstance(value, (str, bool)))
+        if counts and len(counts) <= MAX_DISTINCT_VALUES:
+            summary[key] = dict(counts.most_common())
+    return summary
+
+
+def compact(value: Any, max_items: int, sample_items: int, max_string: int) -> Any:
+    """Recursively replaces large arrays with counts, summaries and samples, and truncates long strings."""
+    if isinstance(value, dict):
+        return {key: compact(item, max_items, sample_items, max_string) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) <= max_items:
+            return [compact(item, max_items, sample_items, max_string) for item in value]
+        return {
+            "count": len(value),
+            "summary": summarize_array(value),
+            "sample": [compact(item, max_items, sample_items, max_string) for item in value[:sample_items]],
+        }
+    if isinstance(value, str) and len(value) > max_string:
+        return value[:max_string] + f"...(+{len(value) - max_string} chars)"
+    return value
+
+
+def fit_to_budget(value: Any, budget: int) -> Tuple[Any, bool]:
+    """Compacts the value with progressively tighter limits until it fits the token budget."""
+    max_items, sample_items, max_string = MAX_ARRAY_ITEMS, SAMPLE_ITEMS, MAX_STRING_LENGTH
+    while True:
+        compacted = compact(value, max_items, sample_items, max_string)
+        if estimate_json_tokens(compacted) <= budget:
+            return compacted, True
+        if max_items <= 1 and sample_items <= 1 and max_string <= 50:
+            break
+        max_items, sample_items, max_string = max(1, max_items // 2), max(1, sample_items // 2), max(50, max_string // 2)
+    # Hard cut as a last resort so the prompt can never exceed the budget
+    text = json.dumps(compacted, default=str)
+    return text[: budget * 4] + "...(truncated)", False
+
+
+def projection_for(command: str) -> Optional[str]:
+    try:
+        parsed = parse_cli_command(command)
+    except (UnsupportedCommand, ValueError):
+        return None
+    if parsed.options.get("query"):
+        # The agent already chose the fields it wants
+        return None
+    return PROJECTIONS.get((parsed.service, parsed.operation))
+
+
+def store_result(result: Any) -> str:
+    handle = f"res_{uuid.uuid4().hex[:12]}"
+    result_store.set(handle, result)
+    return handle
+
+
+def reduce_output(command: str, result: Any, budget: int = CLI_OUTPUT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """
+    Shrinks a large AWS CLI result before it is returned to the agent.
+
+    Results under CLI_OUTPUT_COMPACT_THRESHOLD tokens are returned unchanged. Larger ones are
+    projected to the useful fields, aggregated and sampled to fit the token budget, and the
+    full result is kept server-side under a handle the agent can page through or query.
+    """
+    original_tokens = estimate_json_tokens(result)
+    if original_tokens <= CLI_OUTPUT_COMPACT_THRESHOLD:
+        return {"success": result}
+
+    reduced = result
+    expression = projection_for(command)
+    if expression and not isinstance(result, str):
+        reduced = jmespath.search(expression, result)
+    reduced, _ = fit_to_budget(reduced, budget)
+
+    handle = store_result(result)
+    annotate(original_tokens=original_tokens, reduced_tokens=estimate_json_tokens(reduced))
+    return {
+        "success": reduced,
+        "result_handle": handle,
+        "note": (
+            f"Output compacted from about {original_tokens} to {estimate_json_tokens(reduced)} tokens. "
+            f"Use the AWS Result Query Tool with handle {handle} to page through or query the full result."
+        ),
+    }
+
+
+def query_result(handle: str, expression: str = "", offset: int = 0, limit: int = 20) -> Dict[str, Any]:
+    """Applies an optional JMESPath expression to a stored result and returns one page of it."""
+    result = result_store.get(handle)
+    if result is None:
+        return {"error": f"Unknown or expired result handle {handle}; run the AWS CLI command again."}
+    try:
+        selected = jmespath.search(expression, result) if expression else result
+    except jmespath.exceptions.JMESPathError as e:
+        return {"error": f"Invalid JMESPath expression: {e}"}
+
+    response: Dict[str, Any] = {"result_handle": handle}
+    if isinstance(selected, list):
+        response.update(total=len(selected), offset=offset, limit=limit)
+        selected = selected[offset : offset + limit]
+    response["success"], _ = fit_to_budget(selected, CLI_OUTPUT_TOKEN_BUDGET)
+    if response["success"] != selected:
+        response["note"] = "Page compacted to fit the token budget; use a narrower expression or smaller limit."
+    return response
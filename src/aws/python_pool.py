@@ -0,0 +1,241 @@
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import traceback
+import uuid
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows has no resource limits; jobs still get the parent-enforced timeout
+    resource = None
+
+# Imported once per worker so diagram jobs don't pay the diagrams/graphviz import cost
+WARM_IMPORTS = (
+    "diagrams",
+    "diagrams.aws.compute",
+    "diagrams.aws.database",
+    "diagrams.aws.network",
+    "diagrams.aws.storage",
+    "diagrams.aws.integration",
+    "graphviz",
+)
+
+# Workers are recycled after this many jobs so module-level state leaked by generated code can't build up
+MAX_JOBS_PER_WORKER = 50
+
+# Environment variables generated code may see; everything else, such as AWS credentials and the
+# Supabase service key, is removed from the worker's environment. HOME points at an empty directory
+# of the worker's own, so ~/.aws and other per-user credential files are not found either
+WORKER_ENV = ("PATH", "LANG", "LANGUAGE", "TMPDIR", "TZ")
+
+# File name generated code is compiled under, so its frames can be told apart in tracebacks
+JOB_FILENAME = "<python_interpreter_tool>"
+
+
+def set_memory_limit(memory_mb: int) -> None:
+    if resource is None or not memory_mb:
+        return
+    limit = memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def set_cpu_limit(cpu_seconds: int) -> None:
+    """Allows the next job cpu_seconds of CPU on top of what the worker has already used."""
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def scrub_environment(home: str) -> None:
+    for name in list(os.environ):
+        if name not in WORKER_ENV and not name.startswith("LC_"):
+            del os.environ[name]
+    os.environ["HOME"] = home
+
+
+def job_frames_only(error: traceback.TracebackException) -> traceback.TracebackException:
+    """Drops the worker's own frames from the traceback and the exceptions it was chained from."""
+    error.stack = traceback.StackSummary.from_list(
+        [frame for frame in error.stack if frame.filename == JOB_FILENAME]
+    )
+    for chained in (error.__cause__, error.__context__):
+        if chained is not None:
+            job_frames_only(chained)
+    return error
+
+
+def format_job_error(exc: BaseException) -> str:
+    return "".join(job_frames_only(traceback.TracebackException.from_exception(exc)).format())
+
+
+def worker_main(conn, memory_mb: int, cpu_seconds: int, home: str) -> None:
+    """Worker process loop: receives code, runs it with fresh globals in the job directory and sends back the output."""
+    scrub_environment(home)
+    set_memory_limit(memory_mb)
+    for module in WARM_IMPORTS:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+    # Between jobs the worker waits in its empty home rather than the repository
+    os.chdir(home)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        output, error = io.StringIO(), None
+        set_cpu_limit(cpu_seconds)
+        try:
+            os.chdir(job["cwd"])
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                exec(compile(job["code"], JOB_FILENAME, "exec"), {"__name__": "__main__"})
+        except BaseException as e:
+            error = format_job_error(e)
+        finally:
+            os.chdir(home)
+        conn.send({"output": output.getvalue(), "error": error})
+
+
+class PythonWorker:
+    def __init__(self, context, memory_mb: int, cpu_seconds: int):
+        self.conn, child_conn = context.Pipe()
+        self.home = tempfile.mkdtemp(prefix="python-worker-home-")
+        self.process = context.Process(
+            target=worker_main, args=(child_conn, memory_mb, cpu_seconds, self.home), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        shutil.rmtree(self.home, ignore_errors=True)
+
+
+class PythonWorkerPool:
+    """
+    Pool of pre-warmed worker processes for the Python interpreter tool.
+
+    Each job runs with fresh globals in its own output directory under job_dir, with memory
+    and CPU rlimits in the worker and a wall-clock timeout enforced by the parent. A worker
+    that times out, crashes or hits a limit is killed and replaced.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        timeout: float,
+        cpu_seconds: int,
+        memory_mb: int,
+        job_dir: str,
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.job_dir = job_dir
+        # spawn rather than fork: the app process runs Streamlit and boto3 threads
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[PythonWorker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self) -> None:
+        """Spawns the workers; called lazily on the first job so importing the tools stays cheap."""
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+            self._started = True
+
+    def _spawn(self) -> PythonWorker:
+        return PythonWorker(self._context, self.memory_mb, self.cpu_seconds)
+
+    def _release(self, worker: PythonWorker, healthy: bool) -> None:
+        if not healthy or worker.jobs >= MAX_JOBS_PER_WORKER or not worker.alive():
+            worker.kill()
+            worker = self._spawn()
+        self._idle.put(worker)
+
+    def run(self, code: str, timeout: Optional[float] = None, job_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Runs the code on an idle worker.
+
+        Args:
+        code (str): The Python code to execute.
+        timeout (float): Wall-clock limit in seconds, defaults to the pool timeout.
+        job_dir (str): Directory the job's output directory is created in, defaults to the pool job_dir.
+
+        Returns:
+        Dict[str, Any]: The captured output, the error traceback if any, the job directory and the files written to it.
+        """
+        self.start()
+        timeout = timeout or self.timeout
+        job_id = uuid.uuid4().hex[:12]
+        cwd = os.path.join(job_dir or self.job_dir, job_id)
+        os.makedirs(cwd, exist_ok=True)
+
+        worker = self._idle.get()
+        worker.jobs += 1
+        healthy = False
+        try:
+            worker.conn.send({"code": code, "cwd": os.path.abspath(cwd)})
+            if worker.conn.poll(timeout):
+                result = worker.conn.recv()
+                healthy = True
+            else:
+                result = {"output": "", "error": f"Execution timed out after {timeout} seconds"}
+        except (EOFError, OSError):
+            # The worker died mid-job, usually from the memory or CPU limit
+            worker.process.join(timeout=1)
+            result = {"output": "", "error": f"Execution was terminated (exit code {worker.process.exitcode})"}
+        finally:
+            self._release(worker, healthy)
+
+        result["cwd"] = cwd
+        result["files"] = self.job_files(cwd)
+        if not result["files"]:
+            shutil.rmtree(cwd, ignore_errors=True)
+        return result
+
+    async def arun(self, code: str, timeout: Optional[float] = None, job_dir: Optional[str] = None) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.run, code, timeout, job_dir)
+
+    @staticmethod
+    def job_files(cwd: str) -> List[str]:
+        files = []
+        for root, _, names in os.walk(cwd):
+            files.extend(os.path.relpath(os.path.join(root, name)) for name in sorted(names))
+        return files
+
+    def shutdown(self) -> None:
+        with self._lock:
+            while not self._idle.empty():
+                self._idle.get_nowait().kill()
+            self._started = False
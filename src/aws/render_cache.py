@@ -0,0 +1,261 @@
+import ast
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.aws.context import get_session_id
+from src.model.config import (
+    RENDER_CACHE_DIR,
+    RENDER_CACHE_QUOTA_MB,
+    RENDER_CACHE_SIZE,
+    RENDER_CACHE_TTL,
+    SESSION_ARTIFACTS_DIR,
+    SESSION_ARTIFACTS_QUOTA_MB,
+    SESSION_ARTIFACTS_TTL,
+)
+from src.model.tracing import span
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".pdf")
+META_FILE = "render.json"
+
+# Code importing these fetches live data, e.g. through boto3, so its output is never cached
+LIVE_DATA_MODULES = {"boto3", "botocore", "requests", "urllib", "urllib3", "httpx", "http", "socket", "subprocess"}
+
+# Stale session directories are looked for at most this often, in seconds
+SESSION_SWEEP_INTERVAL = 3600
+
+
+def canonical_code(code: str) -> str:
+    """Normalizes code through its AST so formatting, comment and quoting differences hash the same."""
+    try:
+        return ast.unparse(ast.parse(code))
+    except SyntaxError:
+        return "\n".join(line.rstrip() for line in code.strip().splitlines())
+
+
+def render_key(code: str) -> str:
+    return hashlib.sha256(canonical_code(code).encode("utf-8")).hexdigest()
+
+
+def fetches_live_data(code: str) -> bool:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module or ""]
+        else:
+            continue
+        if any(name.split(".")[0] in LIVE_DATA_MODULES for name in names):
+            return True
+    return False
+
+
+def image_files(files: List[str]) -> List[str]:
+    return [path for path in files if path.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+
+
+def subdirectories(path: str) -> List[str]:
+    return [entry.path for entry in os.scandir(path) if entry.is_dir()] if os.path.isdir(path) else []
+
+
+class RenderCache:
+    """
+    Content-addressed store for files rendered by the Python interpreter tool.
+
+    Successful runs that produce images are copied into root/<key>, where the key is the
+    hash of the AST-canonical code. A repeated request links the stored files into the
+    session's artifact directory instead of re-running the code. Entries are evicted least
+    recently used first once there are more than maxsize of them or they exceed quota_mb,
+    and rendered again once older than ttl seconds. Code that imports a network or process
+    module, such as boto3, is always run, since its output reflects live data.
+
+    Each session's job and render directories are kept within session_quota_mb, oldest
+    first, and sessions idle for session_ttl seconds are deleted.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        sessions_root: str,
+        maxsize: int,
+        quota_mb: int,
+        ttl: float = RENDER_CACHE_TTL,
+        session_quota_mb: int = SESSION_ARTIFACTS_QUOTA_MB,
+        session_ttl: float = SESSION_ARTIFACTS_TTL,
+    ):
+        self.root = root
+        self.sessions_root = sessions_root
+        self.maxsize = maxsize
+        self.quota_bytes = quota_mb * 1024 * 1024
+        self.ttl = ttl
+        self.session_quota_bytes = session_quota_mb * 1024 * 1024
+        self.session_ttl = session_ttl
+        self.hits = 0
+        self.misses = 0
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.sessions_root, re.sub(r"[^\w-]", "_", session_id))
+
+    def job_dir(self, session_id: str) -> str:
+        return os.path.join(self.session_dir(session_id), "jobs")
+
+    def lookup(self, key: str, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = os.path.join(self.root, key)
+        meta_path = os.path.join(entry, META_FILE)
+        with self._lock:
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                if time.time() - meta.get("created", 0) > self.ttl:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    raise KeyError(key)
+                # The metadata mtime is the entry's recency for LRU eviction
+                os.utime(meta_path)
+                files = self.link_into_session(entry, meta["files"], session_id, key)
+            except (OSError, ValueError, KeyError):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"output": meta["output"], "error": None, "files": files, "images": image_files(files), "cached": True}
+
+    def link_into_session(self, entry: str, names: List[str], session_id: str, key: str) -> List[str]:
+        target_dir = os.path.join(self.session_dir(session_id), "renders", key)
+        files = []
+        for name in names:
+            source, target = os.path.join(entry, name), os.path.join(target_dir, name)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    os.link(source, target)
+                except OSError:
+                    shutil.copy2(source, target)
+            files.append(os.path.relpath(target))
+        # Marks the render as the session's latest, so session eviction keeps it
+        os.utime(target_dir)
+        return files
+
+    def store(self, key: str, result: Dict[str, Any], cacheable: bool = True) -> Dict[str, Any]:
+        """Adds the images to the result and keeps successful, cacheable renders for later lookups."""
+        result["images"] = image_files(result["files"])
+        if not cacheable or result["error"] or not result["images"]:
+            return result
+
+        entry = os.path.join(self.root, key)
+        staging = f"{entry}.tmp-{uuid.uuid4().hex[:8]}"
+        names = [os.path.relpath(path, result["cwd"]) for path in result["files"]]
+        with self._lock:
+            for name, path in zip(names, result["files"]):
+                os.makedirs(os.path.dirname(os.path.join(staging, name)), exist_ok=True)
+                shutil.copy2(path, os.path.join(staging, name))
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump({"output": result["output"], "files": names, "created": time.time()}, f)
+            try:
+                os.replace(staging, entry)
+            except OSError:
+                # Another session stored the same render first
+                shutil.rmtree(staging, ignore_errors=True)
+            self.evict()
+        return result
+
+    def evict(self) -> None:
+        if not os.path.isdir(self.root):
+            return
+        entries = []
+        for name in os.listdir(self.root):
+            meta_path = os.path.join(self.root, name, META_FILE)
+            if ".tmp-" in name or not os.path.exists(meta_path):
+                continue
+            path = os.path.join(self.root, name)
+            entries.append((os.path.getmtime(meta_path), directory_size(path), path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.maxsize or total > self.quota_bytes):
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def evict_session(self, session_id: str) -> None:
+        """Deletes the session's oldest job and render directories beyond its quota or older than session_ttl."""
+        session_dir = self.session_dir(session_id)
+        entries = [
+            (os.path.getmtime(path), directory_size(path), path)
+            for kind in ("jobs", "renders")
+            for path in subdirectories(os.path.join(session_dir, kind))
+        ]
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        expired = time.time() - self.session_ttl
+        # The newest directory holds the files of the run that is being answered
+        while len(entries) > 1 and (total > self.session_quota_bytes or entries[0][0] < expired):
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def evict_idle_sessions(self) -> None:
+        """Deletes the artifacts of sessions without a run for session_ttl seconds."""
+        expired = time.time() - self.session_ttl
+        for session_dir in subdirectories(self.sessions_root):
+            runs = [path for kind in ("jobs", "renders") for path in subdirectories(os.path.join(session_dir, kind))]
+            if max([os.path.getmtime(session_dir)] + [os.path.getmtime(path) for path in runs]) < expired:
+                shutil.rmtree(session_dir, ignore_errors=True)
+
+    def evict_artifacts(self, session_id: str) -> None:
+        with self._lock:
+            self.evict_session(session_id)
+            if time.time() >= self._next_sweep:
+                self._next_sweep = time.time() + SESSION_SWEEP_INTERVAL
+                self.evict_idle_sessions()
+
+    def _lookup(self, key: str, session_id: str, cacheable: bool) -> Optional[Dict[str, Any]]:
+        if not cacheable:
+            return None
+        with span("python.render_cache") as item:
+            cached = self.lookup(key, session_id)
+            item.set(cache_hit=cached is not None)
+        return cached
+
+    def run(self, code: str, execute: Callable[[str, str], Dict[str, Any]]) -> Dict[str, Any]:
+        """Returns the cached render for the code, or runs execute(code, job_dir) and stores its output."""
+        key, session_id, cacheable = render_key(code), get_session_id(), not fetches_live_data(code)
+        result = self._lookup(key, session_id, cacheable)
+        if result is None:
+            with span("python.execute", "tool", bytes=len(code)):
+                result = self.store(key, execute(code, self.job_dir(session_id)), cacheable)
+        self.evict_artifacts(session_id)
+        return result
+
+    async def arun(self, code: str, execute: Callable[[str, str], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        key, session_id, cacheable = render_key(code), get_session_id(), not fetches_live_data(code)
+        result = self._lookup(key, session_id, cacheable)
+        if result is None:
+            with span("python.execute", "tool", bytes=len(code)):
+                result = self.store(key, await execute(code, self.job_dir(session_id)), cacheable)
+        self.evict_artifacts(session_id)
+        return result
+
+    def clear_session(self, session_id: str) -> None:
+        """Deletes a session's artifacts; the shared render store is left for other sessions."""
+        shutil.rmtree(self.session_dir(session_id), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+render_cache = RenderCache(RENDER_CACHE_DIR, SESSION_ARTIFACTS_DIR, RENDER_CACHE_SIZE, RENDER_CACHE_QUOTA_MB)
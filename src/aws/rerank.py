@@ -0,0 +1,93 @@
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+
+from src.model.config import CROSS_ENCODER_MODEL
+
+# Keeps identifiers such as t3.medium, aws_s3_bucket or --instance-ids together as one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_.\-/:]*[a-z0-9]|[a-z0-9]")
+SUBTOKEN_SEPARATORS = re.compile(r"[_.\-/:]+")
+
+_cross_encoder = None
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases and tokenizes text, emitting compound identifiers and their parts."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        parts = [part for part in SUBTOKEN_SEPARATORS.split(token) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(*rankings: List[int], k: int = 60) -> List[int]:
+    """Fuses rankings of candidate indices into a single ordering."""
+    scores = Counter()
+    for ranking in rankings:
+        for rank, index in enumerate(ranking):
+            scores[index] += 1.0 / (k + rank + 1)
+    return [index for index, _ in scores.most_common()]
+
+
+def bm25_scores(query: str, texts: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Scores texts against the query with BM25, using the candidates themselves as the corpus."""
+    query_terms = set(tokenize(query))
+    documents = [Counter(tokenize(text)) for text in texts]
+    average_length = sum(sum(doc.values()) for doc in documents) / max(len(documents), 1) or 1.0
+
+    scores = []
+    for doc in documents:
+        length = sum(doc.values())
+        score = 0.0
+        for term in query_terms:
+            frequency = doc.get(term, 0)
+            if not frequency:
+                continue
+            document_frequency = sum(1 for other in documents if term in other)
+            idf = math.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * length / average_length))
+        scores.append(score)
+    return scores
+
+
+def cross_encoder_scores(query: str, texts: List[str]) -> List[float]:
+    global _cross_encoder
+    if _cross_encoder is None:
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "RERANKER=cross_encoder requires sentence-transformers: pip install sentence-transformers"
+            ) from e
+        _cross_encoder = CrossEncoder(CROSS_ENCODER_MODEL, device="cpu")
+    return [float(score) for score in _cross_encoder.predict([(query, text) for text in texts])]
+
+
+def rerank(
+    query: str, results: List[Tuple[Document, float]], method: str = "bm25"
+) -> List[Tuple[Document, float]]:
+    """
+    Re-ranks retrieved (document, score) pairs locally.
+
+    The re-ranker's ordering is fused with the retrieval ordering rather than replacing it,
+    so documents that match semantically but share no terms with the query are not buried.
+    """
+    if not results or method in (None, "", "none"):
+        return results
+
+    texts = [doc.page_content for doc, _ in results]
+    if method == "bm25":
+        scores = bm25_scores(query, texts)
+    elif method == "cross_encoder":
+        scores = cross_encoder_scores(query, texts)
+    else:
+        raise ValueError(f"Unknown reranker: {method}")
+
+    reranked = sorted(range(len(results)), key=lambda index: scores[index], reverse=True)
+    # The re-ranker's ordering goes first so it wins ties
+    return [results[index] for index in reciprocal_rank_fusion(reranked, list(range(len(results))))]
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+
+# Tag attached to the RAG tool chains so their generations can be told apart from the agent's
+RAG_TOOL_TAG = "rag_tool"
+
+
+class StreamingAnswerHandler(BaseCallbackHandler):
+    """
+    Streams Bedrock tokens into Streamlit placeholders as they are generated.
+
+    Agent generations are buffered until the ReAct "Final Answer:" marker appears, after
+    which the answer is streamed into `answer_container`. Generations from the RAG tools
+    are streamed into `tool_container` while they run.
+    """
+
+    ANSWER_PREFIX = "Final Answer:"
+
+    def __init__(self, answer_container, tool_container=None):
+        self.answer_container = answer_container
+        self.tool_container = tool_container
+        self.answer = ""
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        tags: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._runs[run_id] = {"text": "", "rag": RAG_TOOL_TAG in (tags or [])}
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        run["text"] += token
+
+        if run["rag"]:
+            if self.tool_container is not None:
+                self.tool_container.markdown(run["text"] + "▌")
+            return
+
+        index = run["text"].find(self.ANSWER_PREFIX)
+        if index != -1:
+            self.answer = run["text"][index + len(self.ANSWER_PREFIX):].strip()
+            self.answer_container.markdown(self.answer + "▌")
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        if run["rag"]:
+            if self.tool_container is not None:
+                self.tool_container.empty()
+        elif self.answer:
+            self.answer_container.markdown(self.answer)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
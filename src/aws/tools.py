@@ -1,34 +1,117 @@
 import json
 import warnings
-from typing import Any, Dict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict
 
-from langchain.chains.retrieval_qa.base import RetrievalQA
-from langchain_community.tools import ShellTool
+from langchain_core.callbacks import Callbacks
 from langchain_core.prompts import PromptTemplate
-from langchain_experimental.utilities import PythonREPL
 from langchain_core.tools import StructuredTool
 
-from src.aws.vectorstore import get_diagrams_documentation_vector_store
-from src.aws.vectorstore import get_aws_documentation_vector_store
-from src.aws.vectorstore import get_web_service_documentation_vector_store
-from src.model.config import LLM
+from src.aws.answer_cache import answer_cache, answer_payload
+from src.aws.cli_executor import aws_cli_executor
+from src.aws.knowledge import aanswer_query, answer_query
+from src.aws.output_reducer import query_result, reduce_output
+from src.aws.python_pool import PythonWorkerPool
+from src.aws.render_cache import render_cache
+from src.aws.streaming import RAG_TOOL_TAG
+from src.aws.vectorstore import (
+    get_aws_documentation_vector_store,
+    get_diagrams_documentation_vector_store,
+    get_web_service_documentation_vector_store,
+)
+from src.model.config import (
+    MATCH_COUNT,
+    PYTHON_JOB_CPU_SECONDS,
+    PYTHON_JOB_DIR,
+    PYTHON_JOB_MEMORY_MB,
+    PYTHON_JOB_TIMEOUT,
+    PYTHON_POOL_SIZE,
+)
+from src.model.embedding import get_text_embedding_model
+from src.model.registry import get_llm
+from src.model.tracing import span
+
+if TYPE_CHECKING:
+    from langchain.chains.retrieval_qa.base import RetrievalQA
 
 # Ignore all user warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
-shell_tool = ShellTool()
-python_repl = PythonREPL()
+python_pool = PythonWorkerPool(
+    size=PYTHON_POOL_SIZE,
+    timeout=PYTHON_JOB_TIMEOUT,
+    cpu_seconds=PYTHON_JOB_CPU_SECONDS,
+    memory_mb=PYTHON_JOB_MEMORY_MB,
+    job_dir=PYTHON_JOB_DIR,
+)
 
 
-def well_arch_tool_function(query: str) -> Dict[str, Any]:
-    vector_store = get_aws_documentation_vector_store()
+def build_qa_chain(vector_store, prompt: PromptTemplate, route: str) -> "RetrievalQA":
+    """Builds a RetrievalQA chain over the vector store with the given RAG prompt and the route's model."""
+    from langchain.chains.retrieval_qa.base import RetrievalQA
 
     retriever = vector_store.as_retriever(
-        search_kwargs={'k': 5},
+        search_kwargs={'k': MATCH_COUNT},
+    )
+
+    return RetrievalQA.from_llm(
+        llm=get_llm(route), prompt=prompt, retriever=retriever, return_source_documents=True
     )
 
-    # RAG template
-    prompt_RAG = """
+
+def invoke_qa_chain(
+    tool_name: str, table_name: str, qa_chain: "RetrievalQA", query: str, callbacks: Callbacks = None
+) -> Dict[str, Any]:
+    """
+    Answers the query with the QA chain, reusing a cached answer for a similar earlier query.
+
+    The query embedding is cached, so the retriever's own embedding call is a cache hit.
+    Callbacks are forwarded so the generation streams to the UI under the RAG tool tag.
+    """
+    query_vector = get_text_embedding_model().embed_query(query)
+    with span("answer_cache", tool=tool_name) as item:
+        cached = answer_cache.lookup(tool_name, table_name, query_vector)
+        item.set(cache_hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    response = qa_chain.invoke({"query": query}, config={"callbacks": callbacks, "tags": [RAG_TOOL_TAG]})
+    return cache_qa_response(tool_name, table_name, query_vector, response)
+
+
+async def ainvoke_qa_chain(
+    tool_name: str, table_name: str, qa_chain: "RetrievalQA", query: str, callbacks: Callbacks = None
+) -> Dict[str, Any]:
+    """Async counterpart of invoke_qa_chain."""
+    query_vector = await get_text_embedding_model().aembed_query(query)
+    with span("answer_cache", tool=tool_name) as item:
+        cached = answer_cache.lookup(tool_name, table_name, query_vector)
+        item.set(cache_hit=cached is not None)
+    if cached is not None:
+        return cached
+
+    response = await qa_chain.ainvoke(
+        {"query": query}, config={"callbacks": callbacks, "tags": [RAG_TOOL_TAG]}
+    )
+    return cache_qa_response(tool_name, table_name, query_vector, response)
+
+
+def cache_qa_response(tool_name: str, table_name: str, query_vector, response: Dict[str, Any]) -> Dict[str, Any]:
+    """Stores a generated answer and returns it in the same shape as a cached one."""
+    answer_cache.store(
+        tool_name,
+        table_name,
+        query_vector,
+        query=response["query"],
+        result=response["result"],
+        source_documents=response["source_documents"],
+    )
+    return answer_payload(response["query"], response["result"], response["source_documents"], cached=False)
+
+
+# RAG templates
+WELL_ARCH_RAG_PROMPT = PromptTemplate(
+    template="""
         You are an expert in the AWS Well-Architected Framework.
 
         Respond with the most relevant sections of the AWS Well-Architected Framework documentation based on the question below. Ensure your response is accurate and provides best practices.
@@ -39,37 +122,39 @@ def well_arch_tool_function(query: str) -> Dict[str, Any]:
         Context:
         {context}
 
-        """
+        """,
+    input_variables=["context", "question"],
+)
 
-    prompt_RAG_tempate = PromptTemplate(
-        template=prompt_RAG, input_variables=["context", "question"]
-    )
 
-    qa_chain = RetrievalQA.from_llm(
-        llm=LLM, prompt=prompt_RAG_tempate, retriever=retriever, return_source_documents=True
-    )
+@lru_cache(maxsize=None)
+def get_well_arch_qa_chain() -> "RetrievalQA":
+    # Built once per process; RetrievalQA holds no per-call state so it is shared across sessions
+    return build_qa_chain(get_aws_documentation_vector_store(), WELL_ARCH_RAG_PROMPT, "well_arch")
+
+
+def well_arch_tool_function(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    response = invoke_qa_chain("well_arch_tool", "aws_documents", get_well_arch_qa_chain(), query, callbacks)
 
-    response = qa_chain.invoke({"query": query})
+    return {"code": response}
+
+
+async def well_arch_tool_coroutine(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    response = await ainvoke_qa_chain("well_arch_tool", "aws_documents", get_well_arch_qa_chain(), query, callbacks)
 
     return {"code": response}
 
 
 well_arch_tool = StructuredTool.from_function(
     func=well_arch_tool_function,
+    coroutine=well_arch_tool_coroutine,
     name="Well Arch Tool",
     description="Returns text from AWS Well-Architected Framework related to the query",
 )
 
 
-def web_service_search_function(query: str) -> Dict[str, Any]:
-    vector_store = get_web_service_documentation_vector_store()
-
-    retriever = vector_store.as_retriever(
-        search_kwargs={'k': 5},
-    )
-
-    # RAG template
-    prompt_RAG = """
+WEB_SERVICE_RAG_PROMPT = PromptTemplate(
+    template="""
         You are an expert in providing Amazon Web Services based on the AWS Whitepaper Overview of Amazon Web Services.
 
         Respond with the most relevant sections of the AWS Whitepaper documentation based on the question below. 
@@ -81,40 +166,50 @@ def web_service_search_function(query: str) -> Dict[str, Any]:
         Context:
         {context}
 
-        """
+        """,
+    input_variables=["context", "question"],
+)
 
-    prompt_RAG_tempate = PromptTemplate(
-        template=prompt_RAG, input_variables=["context", "question"]
-    )
 
-    qa_chain = RetrievalQA.from_llm(
-        llm=LLM, prompt=prompt_RAG_tempate, retriever=retriever, return_source_documents=True
+@lru_cache(maxsize=None)
+def get_web_service_qa_chain() -> "RetrievalQA":
+    return build_qa_chain(get_web_service_documentation_vector_store(), WEB_SERVICE_RAG_PROMPT, "web_service")
+
+
+def web_service_search_function(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    response = invoke_qa_chain(
+        "web_service_search_tool", "web_service_documents", get_web_service_qa_chain(), query, callbacks
     )
 
-    response = qa_chain.invoke({"query": query})
+    return {"code": response}
+
+
+async def web_service_search_coroutine(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    response = await ainvoke_qa_chain(
+        "web_service_search_tool", "web_service_documents", get_web_service_qa_chain(), query, callbacks
+    )
 
     return {"code": response}
 
 
 web_service_search_tool = StructuredTool.from_function(
     func=web_service_search_function,
+    coroutine=web_service_search_coroutine,
     name="Web Service Search Tool",
     description="Selects the most suitable AWS web service based on the user input",
 )
 
 
 def parse_aws_response(command, response):
-    """Parses AWS CLI response, looking for JSON data or handling plain text."""
+    """Parses AWS CLI response, looking for JSON data or handling plain text, and compacts large outputs."""
     if isinstance(response, str):
         if "error" in response:
             return {"command": command, "error": response}
         try:
-            parsed_response = json.loads(response)
-            return {"success": parsed_response}
+            response = json.loads(response)
         except json.JSONDecodeError:
-            return {"success": response}
-    else:
-        return {"success": response}
+            pass
+    return reduce_output(command, response)
 
 
 def ensure_quotes_balanced(cli_command: str) -> str:
@@ -154,8 +249,8 @@ def aws_cli_tool_function(cli_command: str) -> Dict[str, Any]:
     # Ensure the command is well-formed
     safe_cli_command = ensure_quotes_balanced(cli_command)
 
-    # Execute the command using ShellTool
-    result = shell_tool.run(tool_input={"commands": [safe_cli_command]})
+    # Read-only commands run in-process through pooled boto3 clients, anything else in a subprocess
+    result = aws_cli_executor.run(safe_cli_command)
 
     # Assuming result is returned as a JSON string from the command
     parsed_result = parse_aws_response(command=safe_cli_command, response=result)
@@ -163,22 +258,82 @@ def aws_cli_tool_function(cli_command: str) -> Dict[str, Any]:
     return parsed_result
 
 
+async def aws_cli_tool_coroutine(cli_command: str) -> Dict[str, Any]:
+    """
+    Async counterpart of aws_cli_tool_function.
+
+    Args:
+    cli_command (str): A valid AWS CLI command formatted as a string.
+
+    Returns:
+    Dict[str, Any]: The JSON parsed output of the AWS CLI command.
+    """
+    safe_cli_command = ensure_quotes_balanced(cli_command)
+
+    result = await aws_cli_executor.arun(safe_cli_command)
+
+    return parse_aws_response(command=safe_cli_command, response=result)
+
+
 aws_cli_tool = StructuredTool.from_function(
     func=aws_cli_tool_function,
+    coroutine=aws_cli_tool_coroutine,
     name="AWS CLI Tool",
     description="Runs AWS CLI commands",
 )
 
 
-def aws_cloud_diagram_code_function(query: str) -> Dict[str, Any]:
-    vector_store = get_diagrams_documentation_vector_store()
+def parse_result_query(query: str) -> Dict[str, Any]:
+    """Parses the tool input, a JSON object or "<handle> [jmespath]", into query_result arguments."""
+    query = query.strip()
+    if query.startswith("{"):
+        try:
+            params = json.loads(query)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON input: {e}")
+        if not isinstance(params, dict) or not params.get("handle"):
+            raise ValueError('The JSON input needs a "handle"')
+        return {
+            "handle": str(params["handle"]),
+            "expression": params.get("expression") or "",
+            "offset": int(params.get("offset") or 0),
+            "limit": int(params.get("limit") or 20),
+        }
+    handle, _, expression = query.partition(" ")
+    return {"handle": handle.strip("'\""), "expression": expression.strip()}
+
+
+def aws_result_query_tool_function(query: str) -> Dict[str, Any]:
+    """
+    Queries the full result of an earlier AWS CLI command that was compacted.
+
+    Args:
+    query (str): Either a JSON object {"handle", "expression", "offset", "limit"}, where only the
+        handle is required, or the handle followed by an optional JMESPath expression, e.g.
+        "3f2a9c1b7d4e Reservations[].Instances[].InstanceId".
+
+    Returns:
+    Dict[str, Any]: One page of the selected data.
+    """
+    try:
+        params = parse_result_query(query)
+    except (TypeError, ValueError) as e:
+        return {
+            "error": f"{e}. Pass a JSON object with handle, expression, offset and limit, "
+            "or the handle and an optional JMESPath expression."
+        }
+    return query_result(**params)
+
+
+aws_result_query_tool = StructuredTool.from_function(
+    func=aws_result_query_tool_function,
+    name="AWS Result Query Tool",
+    description="Pages through or runs a JMESPath query over the full result of a compacted AWS CLI output",
+)
 
-    retriever = vector_store.as_retriever(
-        search_kwargs={'k': 5},
-    )
 
-    # RAG template
-    prompt_RAG = """
+DIAGRAMS_RAG_PROMPT = PromptTemplate(
+    template="""
         You are a proficient python developer that specialises in generating AWS cloud diagrmas using the diagrams library. 
         
         Respond with the syntactically correct code for to the question below. Make sure you follow these rules:
@@ -195,17 +350,28 @@ def aws_cloud_diagram_code_function(query: str) -> Dict[str, Any]:
         {context}
 
         Generated Python Code :
-        """
+        """,
+    input_variables=["context", "question"],
+)
 
-    prompt_RAG_tempate = PromptTemplate(
-        template=prompt_RAG, input_variables=["context", "question"]
-    )
 
-    qa_chain = RetrievalQA.from_llm(
-        llm=LLM, prompt=prompt_RAG_tempate, retriever=retriever, return_source_documents=True
+@lru_cache(maxsize=None)
+def get_diagrams_qa_chain() -> "RetrievalQA":
+    return build_qa_chain(get_diagrams_documentation_vector_store(), DIAGRAMS_RAG_PROMPT, "diagrams")
+
+
+def aws_cloud_diagram_code_function(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    response = invoke_qa_chain(
+        "aws_cloud_diagram_code_tool", "diagrams_documents", get_diagrams_qa_chain(), query, callbacks
     )
 
-    response = qa_chain.invoke({"query": query})
+    return {"code": response}
+
+
+async def aws_cloud_diagram_code_coroutine(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    response = await ainvoke_qa_chain(
+        "aws_cloud_diagram_code_tool", "diagrams_documents", get_diagrams_qa_chain(), query, callbacks
+    )
 
     return {"code": response}
 
@@ -214,6 +380,26 @@ aws_cloud_diagram_code_tool = StructuredTool.from_function(
     name="AWS Cloud Diagram Code Generation Tool",
     description="Generates python code for cloud architecture diagrams based on the query",
     func=aws_cloud_diagram_code_function,
+    coroutine=aws_cloud_diagram_code_coroutine,
+)
+
+
+def aws_knowledge_tool_function(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    return {"code": answer_query(query, callbacks)}
+
+
+async def aws_knowledge_tool_coroutine(query: str, callbacks: Callbacks = None) -> Dict[str, Any]:
+    return {"code": await aanswer_query(query, callbacks)}
+
+
+aws_knowledge_tool = StructuredTool.from_function(
+    func=aws_knowledge_tool_function,
+    coroutine=aws_knowledge_tool_coroutine,
+    name="AWS Knowledge Search Tool",
+    description=(
+        "Answers questions that combine AWS best practices, service selection and diagram code in one step, "
+        "searching all the documentation at once and citing its sources"
+    ),
 )
 
 
@@ -225,16 +411,38 @@ def python_interpreter_tool_function(code: str) -> Dict[str, Any]:
     existing_code (str): The Python code to be executed.
 
     Returns:
-    Dict[str, Any]: The output of the Python code execution.
+    Dict[str, Any]: The output of the Python code execution, the files it generated and the images among them.
     """
-    result = python_repl.run(code)
-    return {"output": result}
+    # Diagram code seen before is served from the render cache instead of re-rendering
+    result = render_cache.run(code, lambda code, job_dir: python_pool.run(code, job_dir=job_dir))
+    return format_python_result(result)
+
+
+async def python_interpreter_tool_coroutine(code: str) -> Dict[str, Any]:
+    result = await render_cache.arun(code, lambda code, job_dir: python_pool.arun(code, job_dir=job_dir))
+    return format_python_result(result)
+
+
+def format_python_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    output = result["output"]
+    if result["error"]:
+        output += result["error"]
+    return {"output": output, "files": result["files"], "images": result["images"]}
 
 
 python_interpreter_tool = StructuredTool.from_function(
     func=python_interpreter_tool_function,
+    coroutine=python_interpreter_tool_coroutine,
     name="Python Interpreter Tool",
     description="Runs python code",
 )
 
-TOOLS = [well_arch_tool, aws_cli_tool, aws_cloud_diagram_code_tool, python_interpreter_tool, web_service_search_tool]
+TOOLS = [
+    well_arch_tool,
+    aws_cli_tool,
+    aws_cloud_diagram_code_tool,
+    python_interpreter_tool,
+    web_service_search_tool,
+    aws_result_query_tool,
+    aws_knowledge_tool,
+]
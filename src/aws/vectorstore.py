@@ -1,96 +1,173 @@
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.vectorstores import SupabaseVectorStore
-from langchain_text_splitters import CharacterTextSplitter
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
 
+from langchain_community.vectorstores import SupabaseVectorStore
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.aws.ingest import CORPORA, ingest_all, ingest_corpus
+from src.aws.local_index import load_local_vector_store
+from src.aws.rerank import rerank
+from src.model.config import (
+    EMBEDDING_RESCORE_FACTOR,
+    INGEST_BATCH_SIZE,
+    INGEST_WORKERS,
+    MATCH_COUNT,
+    MATCH_THRESHOLD,
+    RERANK_CANDIDATES,
+    RERANKER,
+    RETRIEVAL_MODE,
+    VECTOR_STORE_BACKEND,
+)
 from src.model.embedding import get_text_embedding_model
-from src.model.supabase_client import supabase_client
-
-embeddings = get_text_embedding_model()
+from src.model.registry import get_supabase_client
+from src.model.tracing import span
+
+
+class TopKSupabaseVectorStore(SupabaseVectorStore):
+    """
+    SupabaseVectorStore that passes k and a similarity threshold to the match function,
+    so the HNSW index is used and only k rows ever leave the database. Compact halfvec or
+    binary indexes fetch rescore_factor times k candidates, re-ranked exactly in the database.
+    """
+
+    def __init__(self, *args, match_threshold: float = MATCH_THRESHOLD, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.match_threshold = match_threshold
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        query: List[float],
+        k: int = MATCH_COUNT,
+        filter: Optional[Dict[str, Any]] = None,
+        postgrest_filter: Optional[str] = None,
+        score_threshold: Optional[float] = None,
+    ) -> List[Tuple[Document, float]]:
+        match_documents_params = self.match_args(query, filter)
+        match_documents_params["match_count"] = k
+        match_documents_params["match_threshold"] = (
+            self.match_threshold if score_threshold is None else score_threshold
+        )
+        match_documents_params["rescore_factor"] = EMBEDDING_RESCORE_FACTOR
+        query_builder = self._client.rpc(self.query_name, match_documents_params)
+
+        if postgrest_filter:
+            query_builder.params = query_builder.params.set(
+                "and", f"({postgrest_filter})"
+            )
+
+        with span("supabase.rpc", "db", function=self.query_name) as item:
+            res = query_builder.execute()
+            item.set(rows=len(res.data))
+
+        return [
+            (
+                Document(metadata=row.get("metadata", {}), page_content=row.get("content", "")),
+                row.get("similarity", 0.0),
+            )
+            for row in res.data
+            if row.get("content")
+        ]
+
+
+class HybridSupabaseVectorStore(TopKSupabaseVectorStore):
+    """
+    Vector store that retrieves with the hybrid_match_* functions, fusing Postgres full-text
+    and vector rankings, and optionally re-ranks an enlarged candidate set locally.
+    """
+
+    def __init__(self, *args, reranker: Optional[str] = RERANKER, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hybrid_query_name = f"hybrid_{self.query_name}"
+        self.reranker = None if reranker == "none" else reranker
+
+    def hybrid_search_with_scores(
+        self, query: str, k: int = MATCH_COUNT, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        params = {
+            "query_text": query,
+            "query_embedding": self._embedding.embed_query(query),
+            "match_count": k * RERANK_CANDIDATES if self.reranker else k,
+            "rescore_factor": EMBEDDING_RESCORE_FACTOR,
+        }
+        if filter:
+            params["filter"] = filter
+
+        with span("supabase.rpc", "db", function=self.hybrid_query_name) as item:
+            res = self._client.rpc(self.hybrid_query_name, params).execute()
+            item.set(rows=len(res.data))
+        results = [
+            (
+                Document(metadata=row.get("metadata", {}), page_content=row.get("content", "")),
+                row.get("similarity", 0.0),
+            )
+            for row in res.data
+            if row.get("content")
+        ]
+        with span("rerank", reranker=self.reranker or "none"):
+            return rerank(query, results, self.reranker)[:k]
+
+    def similarity_search(
+        self, query: str, k: int = MATCH_COUNT, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.hybrid_search_with_scores(query, k, filter)]
+
+    def similarity_search_with_relevance_scores(
+        self, query: str, k: int = MATCH_COUNT, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.hybrid_search_with_scores(query, k, filter)
+
+
+def get_document_vector_store(table_name: str) -> VectorStore:
+    """Returns the retrieval store for a document table according to the configured backend and mode."""
+    if VECTOR_STORE_BACKEND == "local":
+        return load_local_vector_store(table_name)
+
+    vector_store_class = HybridSupabaseVectorStore if RETRIEVAL_MODE == "hybrid" else TopKSupabaseVectorStore
+    return vector_store_class(
+        embedding=get_text_embedding_model(),
+        client=get_supabase_client(),
+        table_name=table_name,
+        query_name=f"match_{table_name}",
+    )
 
 
 def create_web_service_documentation_vector_store():
-    loader = PyMuPDFLoader("./src/docs/web_service_documentation.pdf")
-    documents = loader.load()
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    docs = text_splitter.split_documents(documents)
-
-    vector_store = SupabaseVectorStore.from_documents(
-        docs,
-        embeddings,
-        client=supabase_client,
-        table_name="web_service_documents",
-        query_name="match_web_service_documents",
-        chunk_size=500,
-    )
-    return vector_store
+    ingest_corpus("web_service_documents", CORPORA["web_service_documents"])
+    return get_web_service_documentation_vector_store()
 
 
 def get_web_service_documentation_vector_store():
-    return SupabaseVectorStore(
-        embedding=embeddings,
-        client=supabase_client,
-        table_name="web_service_documents",
-        query_name="match_web_service_documents",
-    )
+    return get_document_vector_store("web_service_documents")
 
 
 def create_diagrams_documentation_vector_store():
-    loader = PyMuPDFLoader("./src/docs/diagrams_documentation.pdf")
-    documents = loader.load()
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    docs = text_splitter.split_documents(documents)
-
-    vector_store = SupabaseVectorStore.from_documents(
-        docs,
-        embeddings,
-        client=supabase_client,
-        table_name="diagrams_documents",
-        query_name="match_diagrams_documents",
-        chunk_size=500,
-    )
-    return vector_store
+    ingest_corpus("diagrams_documents", CORPORA["diagrams_documents"])
+    return get_diagrams_documentation_vector_store()
 
 
 def get_diagrams_documentation_vector_store():
-    return SupabaseVectorStore(
-        embedding=embeddings,
-        client=supabase_client,
-        table_name="diagrams_documents",
-        query_name="match_diagrams_documents",
-    )
+    return get_document_vector_store("diagrams_documents")
 
 
 def create_aws_documentation_vector_store():
-    loader = PyMuPDFLoader("./src/docs/aws_documentation.pdf")
-    documents = loader.load()
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    docs = text_splitter.split_documents(documents)
-
-    vector_store = SupabaseVectorStore.from_documents(
-        docs,
-        embeddings,
-        client=supabase_client,
-        table_name="aws_documents",
-        query_name="match_aws_documents",
-        chunk_size=500,
-    )
-    return vector_store
+    ingest_corpus("aws_documents", CORPORA["aws_documents"])
+    return get_aws_documentation_vector_store()
 
 
 def get_aws_documentation_vector_store():
-    return SupabaseVectorStore(
-        embedding=embeddings,
-        client=supabase_client,
-        table_name="aws_documents",
-        query_name="match_aws_documents",
-    )
+    return get_document_vector_store("aws_documents")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Incrementally embed the documentation PDFs into Supabase")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="concurrent embedding requests")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="rows per upsert")
+    parser.add_argument("--force", action="store_true", help="re-check every chunk even if the PDF is unchanged")
+    args = parser.parse_args()
+
     print("Creating vector stores")
-    create_diagrams_documentation_vector_store()
-    create_aws_documentation_vector_store()
-    create_web_service_documentation_vector_store()
+    ingest_all(workers=args.workers, batch_size=args.batch_size, force=args.force)
 
 
 if __name__ == "__main__":
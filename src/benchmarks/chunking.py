@@ -0,0 +1,109 @@
+"""
+Offline benchmark for document chunking.
+
+Builds in-memory indexes of the PDFs for every combination of chunker, chunk size and
+overlap, with Bedrock replaced by the deterministic fake embedder, and runs the retrieval
+query set against each. Reports recall@k, chunk count, index bytes (vectors plus stored
+content and metadata) and estimated embedding tokens, so CHUNKER, CHUNK_SIZE and
+CHUNK_OVERLAP can be chosen from measurements.
+
+    poetry run bench_chunking --sizes 500 1000 2000 --overlaps 0 100
+"""
+import argparse
+import itertools
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.benchmarks.retrieval import (
+    DEFAULT_QUERIES_PATH,
+    build_memory_stores,
+    install_fakes,
+    load_queries,
+    percentile,
+    run_retrieval,
+)
+
+
+def index_stats(stores: Dict[str, Any]) -> Dict[str, float]:
+    from src.model.tokens import estimate_tokens
+
+    records = [record for store in stores.values() for record in store.records]
+    return {
+        "chunks": len(records),
+        "index_bytes": sum(store.matrix.nbytes for store in stores.values())
+        + sum(len(json.dumps(record)) for record in records),
+        "embed_tokens": sum(estimate_tokens(record["content"]) for record in records),
+        "mean_chunk_chars": float(np.mean([len(record["content"]) for record in records])) if records else 0.0,
+    }
+
+
+def run_sweep(
+    queries: List[Dict[str, Any]],
+    chunkers: List[str],
+    sizes: List[int],
+    overlaps: List[int],
+    k: int,
+    reranker: str,
+) -> List[Dict[str, Any]]:
+    runtime = install_fakes()
+
+    from src.model.embedding import get_text_embedding_model
+
+    embeddings = get_text_embedding_model()
+
+    results = []
+    for chunker, chunk_size, chunk_overlap in itertools.product(chunkers, sizes, overlaps):
+        if chunk_overlap >= chunk_size:
+            continue
+        stores = build_memory_stores(embeddings, chunker=chunker, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        rows = run_retrieval(stores, queries, runtime, k, reranker)
+        recall = [value for row in rows.values() for value in row["recall"]]
+        latency = [value for row in rows.values() for value in row["latency_ms"]]
+        results.append(
+            {
+                "chunker": chunker,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "recall": float(np.mean(recall)) if recall else 0.0,
+                **{f"recall_{corpus}": float(np.mean(row["recall"])) for corpus, row in rows.items()},
+                "p50_latency_ms": percentile(latency, 50),
+                **index_stats(stores),
+            }
+        )
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    columns = ["chunker", "chunk_size", "chunk_overlap", "recall", "chunks", "index_bytes", "embed_tokens"]
+    print("".join(f"{column:>16}" for column in columns))
+    for row in results:
+        print(
+            "".join(
+                f"{row[column]:>16.3f}" if isinstance(row[column], float) else f"{row[column]:>16}"
+                for column in columns
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline chunking benchmark")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH, help="JSONL query set")
+    parser.add_argument("--chunkers", nargs="+", choices=["character", "structured"], default=["character", "structured"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[500, 1000, 2000])
+    parser.add_argument("--overlaps", nargs="+", type=int, default=[0, 100])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--reranker", choices=["none", "bm25", "cross_encoder"], default="none")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = run_sweep(load_queries(args.queries), args.chunkers, args.sizes, args.overlaps, args.k, args.reranker)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
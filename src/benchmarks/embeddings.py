@@ -0,0 +1,163 @@
+"""
+Offline benchmark for embedding size and index storage.
+
+Embeds the PDF chunks at every Titan v2 size, with Bedrock replaced by the deterministic fake
+embedder, and runs the retrieval query set against in-memory indexes of every quantization.
+Reports recall@k, query latency, the memory of the index itself and of the float32 vectors
+kept for exact rescoring, the estimated size of the equivalent pgvector HNSW index and the
+query embedding payload sent with every match RPC, so EMBEDDING_DIMENSIONS and
+EMBEDDING_STORAGE can be chosen from measurements.
+
+    poetry run bench_embeddings --dimensions 256 512 1024 --quantizations float32 float16 binary
+"""
+import argparse
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.benchmarks.retrieval import (
+    DEFAULT_QUERIES_PATH,
+    install_fakes,
+    load_queries,
+    percentile,
+    run_retrieval,
+)
+from src.model.config import EMBEDDING_RESCORE_FACTOR
+
+# Local quantization -> Postgres storage of the same precision
+PGVECTOR_STORAGE = {"float32": "vector", "float16": "halfvec", "binary": "binary"}
+
+# Per-row overhead of a pgvector HNSW index with the default m = 16: index tuple headers and
+# the 2 * m neighbour item pointers of layer 0, at 6 bytes each
+HNSW_ROW_OVERHEAD = 40 + 2 * 16 * 6
+
+
+def pgvector_value_bytes(storage: str, dimensions: int) -> int:
+    if storage == "halfvec":
+        return 8 + 2 * dimensions
+    if storage == "binary":
+        return 8 + dimensions // 8
+    return 8 + 4 * dimensions
+
+
+def embed_corpora(dimensions: int, chunks: Dict[str, List[Any]]):
+    """Returns the embedding model for the size and the vectors of every corpus's chunks."""
+    from src.model import config
+    from src.model.embedding import get_text_embedding_model
+    from src.model.registry import registry
+
+    config.EMBEDDING_DIMENSIONS = dimensions
+    registry.reset("text_embeddings")
+    embeddings = get_text_embedding_model()
+    vectors = {
+        table_name: embeddings.embed_documents([doc.page_content for doc in docs]) for table_name, docs in chunks.items()
+    }
+    return embeddings, vectors
+
+
+def run_sweep(
+    queries: List[Dict[str, Any]], dimensions: List[int], quantizations: List[str], k: int, rescore_factor: int
+) -> List[Dict[str, Any]]:
+    runtime = install_fakes()
+
+    from src.aws.ingest import CORPORA, chunk_id, iter_chunks
+    from src.aws.local_index import LocalVectorStore
+
+    chunks = {table_name: list(iter_chunks(pdf_path)) for table_name, pdf_path in CORPORA.items()}
+
+    results = []
+    for size in dimensions:
+        embeddings, vectors = embed_corpora(size, chunks)
+        payload_bytes = len(json.dumps(embeddings.embed_query(queries[0]["query"]))) if queries else 0
+        for quantization in quantizations:
+            stores = {
+                table_name: LocalVectorStore.from_vectors(
+                    embeddings,
+                    vectors[table_name],
+                    [{"id": chunk_id(table_name, doc), "content": doc.page_content, "metadata": doc.metadata} for doc in docs],
+                    quantization,
+                    reranker="none",
+                    rescore_factor=rescore_factor,
+                )
+                for table_name, docs in chunks.items()
+            }
+            # The fake embedder is cheap, so latency is dominated by scoring the index
+            rows = run_retrieval(stores, queries, runtime, k, "none")
+            recall = [value for row in rows.values() for value in row["recall"]]
+            latency = [value for row in rows.values() for value in row["latency_ms"]]
+            row_count = sum(len(store.records) for store in stores.values())
+            storage = PGVECTOR_STORAGE.get(quantization)
+            results.append(
+                {
+                    "dimensions": size,
+                    "quantization": quantization,
+                    "recall": float(np.mean(recall)) if recall else 0.0,
+                    "p50_latency_ms": percentile(latency, 50),
+                    "p95_latency_ms": percentile(latency, 95),
+                    "index_bytes": sum(
+                        store.matrix.nbytes + (store.scales.nbytes if store.scales is not None else 0)
+                        for store in stores.values()
+                    ),
+                    "rescore_bytes": sum(
+                        store.vectors.nbytes for store in stores.values() if store.vectors is not None
+                    ),
+                    # int8 has no pgvector equivalent
+                    "hnsw_bytes": row_count * (pgvector_value_bytes(storage, size) + HNSW_ROW_OVERHEAD)
+                    if storage
+                    else 0,
+                    "payload_bytes": payload_bytes,
+                }
+            )
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    columns = [
+        "dimensions",
+        "quantization",
+        "recall",
+        "p50_latency_ms",
+        "index_bytes",
+        "rescore_bytes",
+        "hnsw_bytes",
+        "payload_bytes",
+    ]
+    print("".join(f"{column:>16}" for column in columns))
+    for row in results:
+        print(
+            "".join(
+                f"{row[column]:>16.3f}" if isinstance(row[column], float) else f"{row[column]:>16}"
+                for column in columns
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline embedding size and quantization benchmark")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH, help="JSONL query set")
+    parser.add_argument("--dimensions", nargs="+", type=int, choices=[256, 512, 1024], default=[256, 512, 1024])
+    parser.add_argument(
+        "--quantizations",
+        nargs="+",
+        choices=["float32", "float16", "int8", "binary"],
+        default=["float32", "float16", "int8", "binary"],
+    )
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument(
+        "--rescore-factor", type=int, default=EMBEDDING_RESCORE_FACTOR, help="binary candidates per result"
+    )
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = run_sweep(
+        load_queries(args.queries), args.dimensions, args.quantizations, args.k, args.rescore_factor
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
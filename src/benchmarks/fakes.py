@@ -0,0 +1,131 @@
+import hashlib
+import io
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.aws.rerank import tokenize
+from src.model.tokens import estimate_tokens
+
+# Tool chosen by the fake agent LLM, by keyword in the question
+FAKE_TOOL_ROUTES = [
+    ("diagram", "AWS Cloud Diagram Code Generation Tool"),
+    ("service", "Web Service Search Tool"),
+]
+FAKE_DEFAULT_TOOL = "Well Arch Tool"
+
+FAKE_DIAGRAM_CODE = '''from diagrams import Diagram
+from diagrams.aws.compute import EC2
+
+with Diagram("Benchmark", show=False, outformat="png"):
+    EC2("web")
+'''
+
+
+def fake_embedding(text: str, dimensions: int = 1024) -> List[float]:
+    """Deterministic hashed bag-of-words embedding, so similar texts get similar vectors."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token, count in Counter(tokenize(text)).items():
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += (1.0 if digest[4] & 1 else -1.0) * (1 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class FakeBedrockRuntime:
+    """
+    Deterministic stand-in for the bedrock-runtime client.
+
+    Titan embedding requests get a hashed bag-of-words vector. Anthropic messages requests
+    get a scripted ReAct reply: the first agent step calls a documentation tool picked by
+    keyword, the next one gives a final answer. Calls and bytes are counted per model.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+        self.calls: Counter = Counter()
+        self.bytes: Counter = Counter()
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.bytes.clear()
+
+    @staticmethod
+    def _prompt_text(request: Dict[str, Any]) -> str:
+        parts = [request.get("system") or ""]
+        for message in request.get("messages", []):
+            content = message.get("content")
+            if isinstance(content, str):
+                parts.append(content)
+            else:
+                parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+        return "\n".join(part if isinstance(part, str) else json.dumps(part) for part in parts)
+
+    @staticmethod
+    def _question(prompt: str) -> str:
+        matches = re.findall(r"Question:\s*\n?\s*(.+)", prompt)
+        return matches[-1].strip() if matches else prompt.strip()[-200:]
+
+    def complete(self, prompt: str) -> str:
+        question = self._question(prompt)
+        if "Action Input" in prompt:
+            # The scratchpad follows the last question; the format instructions above it also mention Observation
+            if "Observation:" in prompt[prompt.rfind("Question:"):]:
+                return f"Thought: I now know the final answer\nFinal Answer: Based on the documentation: {question}"
+            tool = next((name for keyword, name in FAKE_TOOL_ROUTES if keyword in question.lower()), FAKE_DEFAULT_TOOL)
+            return f"Thought: I should consult the documentation\nAction: {tool}\nAction Input: {question}"
+        if "Generated Python Code" in prompt:
+            return FAKE_DIAGRAM_CODE
+        return f"The most relevant documentation for '{question}' is summarised here."
+
+    def invoke_model(self, body, modelId: str, **kwargs) -> Dict[str, Any]:
+        request = json.loads(body)
+        self.calls[modelId] += 1
+        self.bytes[modelId] += len(body)
+        if "embed" in modelId:
+            text = request.get("inputText", "")
+            dimensions = request.get("dimensions", self.dimensions)
+            payload = {"embedding": fake_embedding(text, dimensions), "inputTextTokenCount": estimate_tokens(text)}
+            return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+        prompt = self._prompt_text(request)
+        text = self.complete(prompt)
+        payload = {
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)},
+        }
+        headers = {
+            "x-amzn-bedrock-input-token-count": str(estimate_tokens(prompt)),
+            "x-amzn-bedrock-output-token-count": str(estimate_tokens(text)),
+        }
+        return {
+            "body": io.BytesIO(json.dumps(payload).encode("utf-8")),
+            "ResponseMetadata": {"HTTPHeaders": headers},
+        }
+
+    def invoke_model_with_response_stream(self, body, modelId: str, **kwargs) -> Dict[str, Any]:
+        request = json.loads(body)
+        self.calls[modelId] += 1
+        self.bytes[modelId] += len(body)
+        prompt = self._prompt_text(request)
+        text = self.complete(prompt)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        events = [{"type": "message_start", "message": {"usage": {"input_tokens": input_tokens, "output_tokens": 0}}}]
+        events += [
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}
+            for token in re.findall(r"\S+\s*|\s+", text)
+        ]
+        events += [
+            {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": output_tokens}},
+            {
+                "type": "message_stop",
+                "amazon-bedrock-invocationMetrics": {"inputTokenCount": input_tokens, "outputTokenCount": output_tokens},
+            },
+        ]
+        return {"body": [{"chunk": {"bytes": json.dumps(event).encode("utf-8")}} for event in events]}
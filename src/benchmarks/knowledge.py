@@ -0,0 +1,109 @@
+"""
+Offline benchmark for multi-corpus questions.
+
+Answers each query of the retrieval query set twice against in-memory indexes, with Bedrock
+replaced by the deterministic fakes: once by calling the Well Arch, Web Service Search and
+Diagram Code tools one after another, as the agent did, and once with the AWS Knowledge Search
+Tool. Reports latency, LLM calls, embedding calls and prompt tokens for both. --llm-latency-ms
+adds a fixed delay to every fake Bedrock call so latency reflects round trips.
+
+    poetry run bench_knowledge --llm-latency-ms 800
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from src.benchmarks.fakes import FakeBedrockRuntime
+from src.benchmarks.retrieval import (
+    DEFAULT_QUERIES_PATH,
+    build_memory_stores,
+    install_fakes,
+    load_queries,
+    percentile,
+)
+
+
+def add_latency(runtime: FakeBedrockRuntime, seconds: float) -> None:
+    for name in ("invoke_model", "invoke_model_with_response_stream"):
+        method = getattr(runtime, name)
+
+        def delayed(*args, _method=method, **kwargs):
+            time.sleep(seconds)
+            return _method(*args, **kwargs)
+
+        setattr(runtime, name, delayed)
+
+
+def run_mode(mode: str, queries: List[Dict[str, Any]], runtime: FakeBedrockRuntime) -> Dict[str, List[float]]:
+    from src.aws import tools
+    from src.aws.answer_cache import answer_cache
+    from src.model.config import TEXT_EMBEDDING_MODEL_ID
+    from src.model.embedding import get_text_embedding_model
+    from src.model.usage import TokenUsageHandler
+
+    sequential = [
+        tools.well_arch_tool_function,
+        tools.web_service_search_function,
+        tools.aws_cloud_diagram_code_function,
+    ]
+    combined = [tools.aws_knowledge_tool_function]
+
+    row = defaultdict(list)
+    for item in queries:
+        # Every query starts cold, so neither mode profits from the other's cached embedding or answer
+        answer_cache.invalidate()
+        get_text_embedding_model().memory.clear()
+        runtime.reset()
+        usage = TokenUsageHandler()
+        start = time.perf_counter()
+        for function in sequential if mode == "sequential" else combined:
+            function(item["query"], callbacks=[usage])
+        row["latency_ms"].append((time.perf_counter() - start) * 1000)
+        row["llm_calls"].append(sum(count for model_id, count in runtime.calls.items() if "anthropic" in model_id))
+        row["embeddings"].append(runtime.calls[TEXT_EMBEDDING_MODEL_ID])
+        row["input_tokens"].append(usage.totals()["input_tokens"])
+    return row
+
+
+def summarize(rows: Dict[str, Dict[str, List[float]]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for mode, row in rows.items():
+        summary[mode] = {
+            "p50_latency_ms": percentile(row["latency_ms"], 50),
+            "p95_latency_ms": percentile(row["latency_ms"], 95),
+            **{f"mean_{key}": sum(row[key]) / len(row[key]) for key in ("llm_calls", "embeddings", "input_tokens")},
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline multi-corpus tool benchmark")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH, help="JSONL query set")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="delay added to every fake Bedrock call")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    runtime = install_fakes()
+
+    from src.aws import vectorstore
+    from src.model.embedding import get_text_embedding_model
+
+    stores = build_memory_stores(get_text_embedding_model())
+    vectorstore.get_document_vector_store = stores.__getitem__
+    add_latency(runtime, args.llm_latency_ms / 1000)
+
+    queries = load_queries(args.queries)
+    summary = summarize({mode: run_mode(mode, queries, runtime) for mode in ("sequential", "combined")})
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    columns = list(next(iter(summary.values())))
+    print(f"{'mode':<12}" + "".join(f"{column:>20}" for column in columns))
+    for mode, row in summary.items():
+        print(f"{mode:<12}" + "".join(f"{row[column]:>20.3f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
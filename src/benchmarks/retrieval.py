@@ -0,0 +1,214 @@
+"""
+Offline benchmark for the RAG retrieval path.
+
+Runs a fixed query set with expected source pages for each corpus against either an
+in-memory LocalVectorStore built from the PDFs or the local Supabase stack, with Bedrock replaced
+by a deterministic fake embedder and LLM. Reports p50/p95 retrieval latency, recall@k,
+embedding calls and result bytes per query and, with --agent, end-to-end agent steps.
+
+    poetry run bench_retrieval --backend memory --agent
+    supabase start && poetry run bench_retrieval --backend supabase --seed
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.benchmarks.fakes import FakeBedrockRuntime
+
+DEFAULT_QUERIES_PATH = os.path.join(os.path.dirname(__file__), "queries.jsonl")
+
+# Defaults of a local `supabase start` stack
+LOCAL_SUPABASE_URL = "http://127.0.0.1:54321"
+LOCAL_SUPABASE_SERVICE_KEY = (
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZS1kZW1vIiwicm9sZSI6InNlcnZpY2Vfcm9sZSIsImV4cCI6"
+    "MTk4MzgxMjk5Nn0.EGIM96RAZx35lJzdJsyH-qQwv8Hdp7fsn3W0YpN81IU"
+)
+
+
+def install_fakes(dimensions: int = 1024) -> FakeBedrockRuntime:
+    """
+    Points the registry's Bedrock client, LLM and embedding model at deterministic fakes.
+
+    Must run before the first agent run, since the agent and QA chains keep the LLM they were built with.
+    Supabase always points at the local stack, whatever the .env file says, and the on-disk caches and
+    the ingest manifest at a temporary directory, so fake embeddings never reach a real database and a
+    later seed_text does not mistake them for the current ingestion.
+    """
+    # Set before the Supabase client is built; load_dotenv does not override variables that are already set
+    os.environ["SUPABASE_URL"] = LOCAL_SUPABASE_URL
+    os.environ["SUPABASE_SERVICE_KEY"] = LOCAL_SUPABASE_SERVICE_KEY
+
+    from src.aws import ingest
+    from src.model import config
+    from src.model.registry import registry
+
+    cache_dir = tempfile.mkdtemp(prefix="suparock-bench-")
+    atexit.register(shutil.rmtree, cache_dir, True)
+    os.environ["SUPAROCK_CACHE_DIR"] = cache_dir
+    config.CACHE_DIR = cache_dir
+    config.LOCAL_INDEX_DIR = os.path.join(cache_dir, "index")
+    ingest.INGEST_MANIFEST_PATH = os.path.join(cache_dir, "ingest_manifest.json")
+
+    runtime = FakeBedrockRuntime(dimensions)
+    config.EMBEDDING_CACHE_PATH = None
+    registry.set("bedrock_runtime", runtime)
+    # Rebuilt from the fake client and the local stack on next use
+    registry.reset("router", "llm", "text_embeddings", "supabase_client")
+    return runtime
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_memory_stores(embeddings, quantization: str = "float32", **chunking) -> Dict[str, Any]:
+    """Builds an in-memory store per corpus; chunking overrides the iter_chunks configuration."""
+    from src.aws.ingest import CORPORA, chunk_id, iter_chunks
+    from src.aws.local_index import LocalVectorStore
+
+    stores = {}
+    for table_name, pdf_path in CORPORA.items():
+        docs = list(iter_chunks(pdf_path, **chunking))
+        # Re-ranking is applied by the benchmark itself so it can be compared
+        stores[table_name] = LocalVectorStore.from_texts(
+            [doc.page_content for doc in docs],
+            embeddings,
+            [doc.metadata for doc in docs],
+            ids=[chunk_id(table_name, doc) for doc in docs],
+            quantization=quantization,
+            reranker="none",
+        )
+    return stores
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def recall_at_k(docs, expected_pages: List[int], k: int) -> float:
+    # Structured chunks can span several pages
+    retrieved_pages = {page for doc in docs for page in doc.metadata.get("pages", [doc.metadata.get("page")])}
+    return len(retrieved_pages & set(expected_pages)) / min(k, len(expected_pages))
+
+
+def run_retrieval(stores, queries, runtime: FakeBedrockRuntime, k: int, reranker: str) -> Dict[str, Any]:
+    from src.aws.rerank import rerank
+    from src.model.config import RERANK_CANDIDATES, TEXT_EMBEDDING_MODEL_ID
+
+    rows = defaultdict(lambda: defaultdict(list))
+    for item in queries:
+        store = stores[item["corpus"]]
+        runtime.reset()
+        start = time.perf_counter()
+        if reranker == "none":
+            docs = store.similarity_search(item["query"], k=k)
+        else:
+            results = store.similarity_search_with_relevance_scores(item["query"], k=k * RERANK_CANDIDATES)
+            docs = [doc for doc, _ in rerank(item["query"], results, reranker)[:k]]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        row = rows[item["corpus"]]
+        row["latency_ms"].append(elapsed_ms)
+        row["recall"].append(recall_at_k(docs, item["expected_pages"], k))
+        row["embeddings"].append(runtime.calls[TEXT_EMBEDDING_MODEL_ID])
+        row["bytes"].append(
+            sum(len(json.dumps({"content": doc.page_content, "metadata": doc.metadata})) for doc in docs)
+        )
+    return rows
+
+
+def run_agent(queries, runtime: FakeBedrockRuntime) -> Dict[str, Any]:
+    from src.aws.agent import get_agent_executor
+    from src.aws.main import SEARCH_CONFIG
+    from src.model.usage import TokenUsageHandler
+
+    executor = get_agent_executor()
+
+    rows = defaultdict(lambda: defaultdict(list))
+    for item in queries:
+        runtime.reset()
+        start = time.perf_counter()
+        usage = TokenUsageHandler()
+        result = executor.invoke({"input": item["query"]}, config={"callbacks": [usage], **SEARCH_CONFIG})
+        row = rows[item["corpus"]]
+        row["agent_ms"].append((time.perf_counter() - start) * 1000)
+        row["agent_steps"].append(len(result["intermediate_steps"]))
+        row["llm_calls"].append(sum(count for model_id, count in runtime.calls.items() if "anthropic" in model_id))
+        row["input_tokens"].append(usage.totals()["input_tokens"])
+    return rows
+
+
+def summarize(rows: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    all_rows = defaultdict(list)
+    for corpus, row in rows.items():
+        for key, values in row.items():
+            all_rows[key].extend(values)
+    for corpus, row in list(rows.items()) + [("all", all_rows)]:
+        summary[corpus] = {"queries": len(next(iter(row.values()), []))}
+        for key, values in row.items():
+            if key.endswith("_ms"):
+                summary[corpus][f"p50_{key}"] = percentile(values, 50)
+                summary[corpus][f"p95_{key}"] = percentile(values, 95)
+            else:
+                summary[corpus][f"mean_{key}"] = float(np.mean(values)) if values else 0.0
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, float]]) -> None:
+    columns = sorted({key for row in summary.values() for key in row} - {"queries"})
+    print(f"{'corpus':<24}{'queries':>8}" + "".join(f"{column:>20}" for column in columns))
+    for corpus, row in summary.items():
+        print(f"{corpus:<24}{row['queries']:>8}" + "".join(f"{row.get(column, 0):>20.3f}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES_PATH, help="JSONL query set")
+    parser.add_argument("--backend", choices=["memory", "supabase"], default="memory")
+    parser.add_argument("--seed", action="store_true", help="ingest the PDFs with the fake embedder first")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--quantization", choices=["float32", "int8"], default="float32")
+    parser.add_argument("--reranker", choices=["none", "bm25", "cross_encoder"], default="none")
+    parser.add_argument("--agent", action="store_true", help="also run the agent end to end")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    runtime = install_fakes()
+
+    from src.aws import vectorstore
+    from src.aws.ingest import ingest_all
+    from src.model.embedding import get_text_embedding_model
+
+    if args.backend == "memory":
+        stores = build_memory_stores(get_text_embedding_model(), args.quantization)
+        vectorstore.get_document_vector_store = stores.__getitem__
+    else:
+        if args.seed:
+            ingest_all(force=True)
+        stores = {table_name: vectorstore.get_document_vector_store(table_name) for table_name in vectorstore.CORPORA}
+
+    queries = load_queries(args.queries)
+    rows = run_retrieval(stores, queries, runtime, args.k, args.reranker)
+    if args.agent:
+        for corpus, row in run_agent(queries, runtime).items():
+            rows[corpus].update(row)
+
+    summary = summarize(rows)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Cold start benchmark for the app and CLI entry points.
+
+Imports each entry module in a fresh interpreter with `python -X importtime`, without AWS
+or Supabase credentials in the environment, and reports the cumulative import time, the
+slowest imports, and any heavy dependency that was imported eagerly although it should
+only be loaded on first use. Exits non-zero when an entry point exceeds --max-ms or loads a
+deferred module, so it can guard cold start in CI.
+
+    poetry run bench_startup --max-ms 1500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+ENTRY_POINTS = ["src.aws.main", "src.aws.batch", "src.aws.vectorstore", "src.aws.local_index"]
+
+# Clients, parsers and frameworks that must not be imported until they are used
+DEFERRED_MODULES = (
+    "boto3",
+    "langchain_aws",
+    "supabase",
+    "fitz",
+    "pymupdf",
+    "langchain.hub",
+    "langchain.agents",
+    "langchain.chains",
+    "langchain_experimental",
+    "matplotlib",
+    "sentence_transformers",
+)
+
+CREDENTIAL_VARIABLES = (
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "AWS_SESSION_TOKEN",
+    "SUPABASE_URL",
+    "SUPABASE_SERVICE_KEY",
+)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Returns (module, self_us, cumulative_us) for every line of -X importtime output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure(module: str) -> Dict[str, Any]:
+    env = {key: value for key, value in os.environ.items() if key not in CREDENTIAL_VARIABLES}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    imports = parse_importtime(completed.stderr)
+    names = {name for name, _, _ in imports}
+    return {
+        "module": module,
+        "ok": completed.returncode == 0,
+        "error": completed.stderr.strip().splitlines()[-1] if completed.returncode else None,
+        "import_ms": next((cumulative for name, _, cumulative in imports if name == module), 0) / 1000,
+        "modules": len(imports),
+        "eager": sorted(deferred for deferred in DEFERRED_MODULES if deferred in names),
+        "slowest": [
+            (name, self_us / 1000) for name, self_us, _ in sorted(imports, key=lambda item: -item[1])[:5]
+        ],
+    }
+
+
+def run_benchmark(modules: List[str], repeats: int) -> List[Dict[str, Any]]:
+    """Measures each module repeats times and keeps its fastest run, the least noisy estimate of cold start."""
+    results = []
+    for module in modules:
+        runs = [measure(module) for _ in range(repeats)]
+        results.append(min(runs, key=lambda run: (not run["ok"], run["import_ms"])))
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'entry point':<24}{'import ms':>12}{'modules':>10}  eager deferred imports")
+    for row in results:
+        status = ", ".join(row["eager"]) or "-"
+        if not row["ok"]:
+            status = f"FAILED: {row['error']}"
+        print(f"{row['module']:<24}{row['import_ms']:>12.1f}{row['modules']:>10}  {status}")
+        slowest = ", ".join(f"{name} {ms:.1f}ms" for name, ms in row["slowest"])
+        print(f"{'':<24}slowest: {slowest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start import benchmark")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="entry modules to import")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-ms", type=float, default=0, help="fail above this import time (0 disables)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.modules, args.repeats)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+    failed = [
+        row["module"]
+        for row in results
+        if not row["ok"] or row["eager"] or (args.max_ms and row["import_ms"] > args.max_ms)
+    ]
+    if failed:
+        print(f"Cold start check failed for: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
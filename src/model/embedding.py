@@ -1,14 +1,30 @@
+import hashlib
 import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from typing import Dict, List, Optional
 
-from langchain_aws import BedrockEmbeddings
+from langchain_core.embeddings import Embeddings
 
-from src.model.config import bedrock_runtime, TEXT_EMBEDDING_MODEL_ID
+from src.model.cache import LRUCache
+from src.model.config import (
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_SIZE,
+    TEXT_EMBEDDING_MODEL_ID,
+)
+from src.model.registry import get_bedrock_runtime, registry
+from src.model.tracing import span, traced
 
 
+@traced("bedrock.embed", "llm")
 def get_embedding_from_titan_text(body) -> list:
     """Invoke the Amazon Titan Model via API request for text embeddings."""
     encoded_body = json.dumps(body).encode("utf-8")
-    response = bedrock_runtime.invoke_model(
+    response = get_bedrock_runtime().invoke_model(
         body=encoded_body,
         modelId=TEXT_EMBEDDING_MODEL_ID,
         accept="application/json",
@@ -18,9 +34,10 @@ def get_embedding_from_titan_text(body) -> list:
     return response_body["embedding"]
 
 
+@traced("bedrock.embed_multimodal", "llm")
 def get_embedding_from_titan_multimodal(body):
     """Invoke the Amazon Titan Model via API request."""
-    response = bedrock_runtime.invoke_model(
+    response = get_bedrock_runtime().invoke_model(
         body=body,
         modelId="amazon.titan-embed-image-v1",
         accept="application/json",
@@ -32,5 +49,97 @@ def get_embedding_from_titan_multimodal(body):
     return response_body["embedding"]
 
 
-def get_text_embedding_model():
-    return BedrockEmbeddings(model_id=TEXT_EMBEDDING_MODEL_ID)
+def normalize_text(text: str) -> str:
+    """Normalizes unicode and whitespace so trivially different texts share a cache key."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with an in-memory LRU backed by a local SQLite store.
+
+    Entries are keyed by model id plus normalized text, so repeated questions within a
+    ReAct loop, and across sessions or processes, skip the Bedrock round trip entirely. Only
+    query vectors are written to SQLite: document vectors from ingestion are stored in the
+    vector tables, and keeping them would grow the store without bound.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_id: str,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        maxsize: int = EMBEDDING_CACHE_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.memory = LRUCache(maxsize=maxsize)
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("pragma journal_mode=wal")
+            self._db.execute(
+                "create table if not exists embeddings (key text primary key, vector blob)"
+            )
+
+    def cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        vector = self.memory.get(key)
+        if vector is not None or self._db is None:
+            return vector
+        with self._lock:
+            row = self._db.execute("select vector from embeddings where key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = array("f", row[0]).tolist()
+        self.memory.set(key, vector)
+        self.disk_hits += 1
+        return vector
+
+    def _store(self, items: Dict[str, List[float]], persist: bool = True) -> None:
+        for key, vector in items.items():
+            self.memory.set(key, vector)
+        if persist and self._db is not None and items:
+            rows = [(key, array("f", vector).tobytes()) for key, vector in items.items()]
+            with self._lock:
+                self._db.executemany("insert or replace into embeddings values (?, ?)", rows)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embedding.embed_documents", "embedding", texts=len(texts)) as item:
+            keys = [self.cache_key(text) for text in texts]
+            vectors = [self._lookup(key) for key in keys]
+
+            missing = {key: text for key, text, vector in zip(keys, texts, vectors) if vector is None}
+            item.set(cache_hit=not missing, misses=len(missing))
+            if missing:
+                self.misses += len(missing)
+                with span("bedrock.embed", "llm", texts=len(missing), bytes=sum(map(len, missing.values()))):
+                    computed = dict(zip(missing, self.embeddings.embed_documents(list(missing.values()))))
+                self._store(computed, persist=False)
+                vectors = [computed[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+            return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("embedding.embed_query", "embedding") as item:
+            key = self.cache_key(text)
+            vector = self._lookup(key)
+            item.set(cache_hit=vector is not None)
+            if vector is None:
+                self.misses += 1
+                with span("bedrock.embed", "llm", texts=1, bytes=len(text)):
+                    vector = self.embeddings.embed_query(text)
+                self._store({key: vector})
+            return vector
+
+    def stats(self) -> Dict[str, int]:
+        return {"memory_hits": self.memory.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+
+def get_text_embedding_model() -> CachedEmbeddings:
+    return registry.get("text_embeddings")
@@ -0,0 +1,32 @@
+import json
+from typing import Any, Dict, Sequence
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def add_cache_control(params: Dict[str, Any], models: Sequence[str]) -> None:
+    """
+    Marks the system prompt of an Anthropic InvokeModel request as a prompt-cache prefix.
+
+    langchain-aws sends the system prompt as a plain string, which cannot carry cache_control,
+    so the request body is rewritten to the equivalent single text block with the marker.
+    """
+    model_id = params.get("modelId", "")
+    if not any(model in model_id for model in models):
+        return
+    body = json.loads(params["body"])
+    system = body.get("system")
+    if not isinstance(system, str) or not system:
+        return
+    body["system"] = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+    params["body"] = json.dumps(body).encode("utf-8") if isinstance(params["body"], bytes) else json.dumps(body)
+
+
+def enable_prompt_caching(client, models: Sequence[str]) -> None:
+    """Registers the cache_control rewrite on a bedrock-runtime client for the given model ids."""
+    for operation in ("InvokeModel", "InvokeModelWithResponseStream"):
+        client.meta.events.register(
+            f"before-parameter-build.bedrock-runtime.{operation}",
+            lambda params, **kwargs: add_cache_control(params, models),
+            unique_id=f"suparock-prompt-caching-{operation}",
+        )
@@ -0,0 +1,151 @@
+import threading
+from typing import Any, Callable, Dict, List
+
+
+class Registry:
+    """
+    Named, process-wide providers that are created on first use and then cached.
+
+    Factories import their heavy dependencies themselves, so importing a module that uses a
+    provider is cheap and does not need credentials until the provider is first used. set()
+    replaces a provider's instance and reset() drops instances so they are rebuilt, which is
+    how the benchmarks swap in fakes.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        # Re-entrant because factories get the providers they depend on
+        self._lock = threading.RLock()
+
+    def provider(self, name: str) -> Callable[[Callable[[], Any]], Callable[[], Any]]:
+        """Registers the decorated function as the factory of a provider."""
+
+        def decorator(factory: Callable[[], Any]) -> Callable[[], Any]:
+            self._factories[name] = factory
+            return factory
+
+        return decorator
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Unknown provider: {name}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def set(self, name: str, instance: Any) -> None:
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self, *names: str) -> None:
+        """Drops the named instances, or all of them, so they are created again on next use."""
+        with self._lock:
+            for name in names or list(self._instances):
+                self._instances.pop(name, None)
+
+    def loaded(self) -> List[str]:
+        return sorted(self._instances)
+
+
+registry = Registry()
+
+
+@registry.provider("bedrock_runtime")
+def create_bedrock_runtime():
+    import os
+
+    import boto3
+
+    from src.model.config import PROMPT_CACHING, PROMPT_CACHING_MODELS
+    from src.model.prompt_caching import enable_prompt_caching
+
+    client = boto3.client(
+        service_name="bedrock-runtime",
+        region_name="us-west-2",
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        aws_session_token=os.getenv("AWS_SESSION_TOKEN"),
+    )
+    if PROMPT_CACHING:
+        enable_prompt_caching(client, PROMPT_CACHING_MODELS)
+    return client
+
+
+@registry.provider("router")
+def create_router():
+    from src.model.config import (
+        MODEL_ROUTES,
+        ROUTER_COOLDOWN,
+        ROUTER_ERROR_BUDGET,
+        ROUTER_ERROR_WINDOW,
+        ROUTER_USAGE_LOG,
+    )
+    from src.model.router import ModelRouter
+
+    return ModelRouter(
+        MODEL_ROUTES,
+        get_bedrock_runtime(),
+        error_budget=ROUTER_ERROR_BUDGET,
+        window=ROUTER_ERROR_WINDOW,
+        cooldown=ROUTER_COOLDOWN,
+        usage_log=ROUTER_USAGE_LOG,
+    )
+
+
+@registry.provider("llm")
+def create_llm():
+    return get_llm()
+
+
+@registry.provider("text_embeddings")
+def create_text_embeddings():
+    from langchain_aws import BedrockEmbeddings
+
+    from src.model import config
+    from src.model.embedding import CachedEmbeddings
+
+    return CachedEmbeddings(
+        BedrockEmbeddings(
+            client=get_bedrock_runtime(),
+            model_id=config.TEXT_EMBEDDING_MODEL_ID,
+            model_kwargs={"dimensions": config.EMBEDDING_DIMENSIONS},
+        ),
+        # Vectors of different sizes must not share cache entries
+        model_id=f"{config.TEXT_EMBEDDING_MODEL_ID}:{config.EMBEDDING_DIMENSIONS}",
+        path=config.EMBEDDING_CACHE_PATH,
+    )
+
+
+@registry.provider("supabase_client")
+def create_supabase_client():
+    import os
+
+    from dotenv import load_dotenv
+
+    from supabase import create_client
+
+    # SUPABASE_* can come from the .env file
+    load_dotenv()
+    return create_client(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_SERVICE_KEY"))
+
+
+def get_bedrock_runtime():
+    return registry.get("bedrock_runtime")
+
+
+def get_router():
+    return registry.get("router")
+
+
+def get_llm(route: str = "agent"):
+    """Returns the chat model of a call site, see MODEL_ROUTES."""
+    return get_router().model(route)
+
+
+def get_supabase_client():
+    return registry.get("supabase_client")
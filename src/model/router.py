@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from src.model.throttle import is_throttling_error
+
+DEFAULT_ROUTE = "agent"
+
+
+class ModelHealth:
+    """
+    Circuit breaker and usage counters for one Bedrock model.
+
+    error_budget failures within window seconds open the circuit for cooldown seconds, during
+    which routes skip the model. The first call after the cooldown is a trial: success closes
+    the circuit, failure opens it again straight away.
+    """
+
+    def __init__(self, error_budget: int, window: float, cooldown: float):
+        self.error_budget = error_budget
+        self.window = window
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.failures: deque = deque()
+        self.calls = 0
+        self.errors = 0
+        self.throttles = 0
+        self.latency_ms = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def record_success(self, latency_ms: float, usage: Dict[str, int]) -> None:
+        with self._lock:
+            self.calls += 1
+            self.latency_ms += latency_ms
+            self.input_tokens += usage.get("prompt_tokens", 0)
+            self.output_tokens += usage.get("completion_tokens", 0)
+            self.failures.clear()
+            self._trial = False
+
+    def record_failure(self, error: BaseException) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            self.throttles += is_throttling_error(error)
+            self.failures.append(now)
+            while self.failures and self.failures[0] < now - self.window:
+                self.failures.popleft()
+            trial_failed = self._trial and now >= self.open_until
+            if trial_failed or len(self.failures) >= self.error_budget:
+                self.open_until = now + self.cooldown
+                self.failures.clear()
+                # The first call after the cooldown decides whether the circuit closes
+                self._trial = True
+
+    def stats(self) -> Dict[str, Any]:
+        successes = self.calls - self.errors
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "throttles": self.throttles,
+            "open": not self.available(),
+            "mean_latency_ms": self.latency_ms / successes if successes else 0.0,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class StreamWatcher:
+    """Forwards to a run manager and notes whether any token was streamed to its callbacks."""
+
+    def __init__(self, run_manager):
+        self.run_manager = run_manager
+        self.streamed = False
+
+    def on_llm_new_token(self, *args: Any, **kwargs: Any) -> Any:
+        self.streamed = True
+        return self.run_manager.on_llm_new_token(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.run_manager, name)
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    Chat model for one route that tries the route's Bedrock models in order.
+
+    A model whose circuit is open is skipped, and a call that fails, for example because
+    Bedrock throttled it, falls through to the next model, unless it already streamed tokens:
+    callbacks would then show a second answer appended to the partial first one. Each result's
+    llm_output carries the route, the model that answered, its latency and whether it was a
+    fallback.
+    """
+
+    route: str
+    candidates: List[BaseChatModel]
+    router: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"route": self.route, "model_ids": [candidate.model_id for candidate in self.candidates]}
+
+    def _ordered_candidates(self) -> List[BaseChatModel]:
+        if not self.candidates:
+            raise ValueError(f"Route {self.route!r} has no models, configure them in MODEL_ROUTES")
+        # When every circuit is open the route still tries its models rather than failing outright
+        available = [candidate for candidate in self.candidates if self.router.health(candidate.model_id).available()]
+        return available or list(self.candidates)
+
+    def _finish(self, result: ChatResult, model_id: str, start: float, index: int) -> ChatResult:
+        latency_ms = (time.perf_counter() - start) * 1000
+        llm_output = dict(result.llm_output or {})
+        usage = llm_output.get("usage") or {}
+        self.router.health(model_id).record_success(latency_ms, usage)
+        llm_output.update(route=self.route, model_id=model_id, latency_ms=latency_ms, fallback=index > 0)
+        self.router.log_call(self.route, model_id, latency_ms, usage, index > 0)
+        return ChatResult(generations=result.generations, llm_output=llm_output)
+
+    def _failed(self, error: BaseException, model_id: str, start: float, index: int, last: bool) -> None:
+        self.router.health(model_id).record_failure(error)
+        self.router.log_call(
+            self.route, model_id, (time.perf_counter() - start) * 1000, {}, index > 0, error=type(error).__name__
+        )
+        if last:
+            raise error
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        candidates = self._ordered_candidates()
+        for index, candidate in enumerate(candidates):
+            start = time.perf_counter()
+            watcher = StreamWatcher(run_manager) if run_manager else None
+            try:
+                result = candidate._generate(messages, stop=stop, run_manager=watcher, **kwargs)
+            except Exception as e:
+                last = index == len(candidates) - 1 or (watcher is not None and watcher.streamed)
+                self._failed(e, candidate.model_id, start, index, last)
+                continue
+            return self._finish(result, candidate.model_id, start, index)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        candidates = self._ordered_candidates()
+        for index, candidate in enumerate(candidates):
+            start = time.perf_counter()
+            watcher = StreamWatcher(run_manager) if run_manager else None
+            try:
+                result = await candidate._agenerate(messages, stop=stop, run_manager=watcher, **kwargs)
+            except Exception as e:
+                last = index == len(candidates) - 1 or (watcher is not None and watcher.streamed)
+                self._failed(e, candidate.model_id, start, index, last)
+                continue
+            return self._finish(result, candidate.model_id, start, index)
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        usage: Dict[str, int] = defaultdict(int)
+        combined: Dict[str, Any] = {}
+        for output in llm_outputs:
+            output = output or {}
+            for token_type, token_count in (output.get("usage") or {}).items():
+                usage[token_type] += token_count
+            combined.update(output)
+        combined["usage"] = dict(usage)
+        return combined
+
+
+class ModelRouter:
+    """
+    Builds a RoutedChatModel per route from the MODEL_ROUTES configuration.
+
+    Each route lists Bedrock models with their inference parameters, in the order they are
+    tried. Circuit breakers are per model, so a throttled model is skipped by every route
+    that uses it. With usage_log set, every call's route, model, latency and tokens are
+    appended to that JSONL file so model tiers can be compared.
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, List[Dict[str, Any]]],
+        client,
+        error_budget: int,
+        window: float,
+        cooldown: float,
+        usage_log: Optional[str] = None,
+    ):
+        self.routes = routes
+        self.client = client
+        self.error_budget = error_budget
+        self.window = window
+        self.cooldown = cooldown
+        self.usage_log = usage_log
+        self._health: Dict[str, ModelHealth] = {}
+        self._models: Dict[str, RoutedChatModel] = {}
+        self._lock = threading.Lock()
+
+    def health(self, model_id: str) -> ModelHealth:
+        with self._lock:
+            if model_id not in self._health:
+                self._health[model_id] = ModelHealth(self.error_budget, self.window, self.cooldown)
+            return self._health[model_id]
+
+    def build_model(self, params: Dict[str, Any]) -> BaseChatModel:
+        from langchain_aws import ChatBedrock
+
+        model_kwargs = {key: value for key, value in params.items() if key != "model_id"}
+        return ChatBedrock(client=self.client, model_id=params["model_id"], streaming=True, model_kwargs=model_kwargs)
+
+    def model(self, route: str = DEFAULT_ROUTE) -> RoutedChatModel:
+        """Returns the chat model of a route; routes that are not configured use the agent's models."""
+        with self._lock:
+            if route not in self._models:
+                params = self.routes.get(route) or self.routes[DEFAULT_ROUTE]
+                candidates = [self.build_model(item) for item in params]
+                self._models[route] = RoutedChatModel(route=route, candidates=candidates, router=self)
+            return self._models[route]
+
+    def log_call(
+        self,
+        route: str,
+        model_id: str,
+        latency_ms: float,
+        usage: Dict[str, int],
+        fallback: bool,
+        error: Optional[str] = None,
+    ) -> None:
+        if not self.usage_log:
+            return
+        record = {
+            "time": time.time(),
+            "route": route,
+            "model_id": model_id,
+            "latency_ms": round(latency_ms, 1),
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "fallback": fallback,
+            "error": error,
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.usage_log) or ".", exist_ok=True)
+            with open(self.usage_log, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            health = dict(self._health)
+        return {model_id: item.stats() for model_id, item in health.items()}
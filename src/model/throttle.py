@@ -0,0 +1,91 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from botocore.exceptions import ClientError
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Bedrock error codes that mean "slow down and try again" rather than a bad request
+THROTTLING_ERROR_CODES = (
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+)
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """
+    Returns True if the error is a retryable Bedrock throttle.
+
+    LangChain wraps boto errors in a ValueError, so the message is checked as well as the code.
+    """
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+    return any(code in str(error) for code in THROTTLING_ERROR_CODES)
+
+
+def call_with_backoff(
+    func: Callable[..., Any],
+    *args,
+    retries: int = 6,
+    base_delay: float = 0.5,
+    max_delay: float = 20.0,
+    **kwargs,
+) -> Any:
+    """Calls func, retrying throttled calls with exponential backoff and jitter."""
+    for attempt in range(retries):
+        try:
+            return func(*args, **kwargs)
+        except Exception as error:
+            if attempt == retries - 1 or not is_throttling_error(error):
+                raise
+            time.sleep(min(max_delay, base_delay * 2**attempt) * random.uniform(0.5, 1.0))
+
+
+class RateLimiter:
+    """
+    Token bucket limiting calls to requests_per_minute, shared by every thread that calls acquire.
+
+    Each caller reserves the next free slot and sleeps until it, so waiting callers are served
+    in order and bursts above the burst size are spread out evenly.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent and returns the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - 1
+            self.updated = now
+            delay = max(0.0, -self.tokens / self.rate)
+            self.waited += delay
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """
+    Holds every LLM call of a run until the rate limiter admits it.
+
+    Under ainvoke LangChain runs synchronous handlers in an executor thread and awaits them
+    before the model call, so blocking here delays the request without blocking the event loop.
+    """
+
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any) -> None:
+        self.limiter.acquire()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self.limiter.acquire()
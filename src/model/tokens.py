@@ -0,0 +1,11 @@
+import json
+from typing import Any
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about four characters per token for Claude on English and JSON)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def estimate_json_tokens(value: Any) -> int:
+    return estimate_tokens(value if isinstance(value, str) else json.dumps(value, default=str))
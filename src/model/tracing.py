@@ -0,0 +1,372 @@
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.outputs import LLMResult
+
+from src.model.cache import LRUCache
+from src.model.config import TRACE_BUFFER_SIZE, TRACE_FILE, TRACE_FLUSH_SPANS
+from src.model.tokens import estimate_tokens
+
+# Upper bounds, in seconds, of the span duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+
+class Span:
+    """One timed operation of a request, with attributes such as tokens, bytes and cache hits."""
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._start_perf = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        self.duration_ms = (time.perf_counter() - self._start_perf) * 1000
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        tracer.record(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def start_span(name: str, kind: str = "internal", parent: Optional[Span] = None, **attributes: Any) -> Span:
+    """Starts a span under the given parent, the current span, or as the root of a new trace."""
+    parent = parent or current_span.get()
+    trace_id = parent.trace_id if parent else uuid.uuid4().hex
+    return Span(name, kind, trace_id, parent.span_id if parent else None, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span]:
+    """Times the enclosed block as a child of the current span and makes it the current span."""
+    item = start_span(name, kind, **attributes)
+    token = current_span.set(item)
+    try:
+        yield item
+    except BaseException as e:
+        item.end(e)
+        raise
+    else:
+        item.end()
+    finally:
+        current_span.reset(token)
+
+
+def traced(name: str, kind: str = "internal"):
+    """Decorator wrapping every call of a sync or async function in a span."""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def annotate(**attributes: Any) -> None:
+    """Adds attributes to the current span, if any."""
+    item = current_span.get()
+    if item is not None:
+        item.set(**attributes)
+
+
+class Metrics:
+    """Aggregates finished spans into duration histograms and token, byte and cache counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.tokens = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.cache = defaultdict(int)
+
+    def observe(self, item: Span) -> None:
+        seconds = (item.duration_ms or 0) / 1000
+        attributes = item.attributes
+        with self._lock:
+            buckets = self.buckets[item.name]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            self.durations[item.name] += seconds
+            self.counts[item.name] += 1
+            if item.error:
+                self.errors[item.name] += 1
+            for direction in ("input", "output"):
+                self.tokens[(item.name, direction)] += int(attributes.get(f"{direction}_tokens") or 0)
+            self.bytes[item.name] += int(attributes.get("bytes") or 0)
+            if "cache_hit" in attributes:
+                self.cache[(item.name, "hit" if attributes["cache_hit"] else "miss")] += 1
+
+    def render(self) -> str:
+        """Renders the metrics in the OpenMetrics text format."""
+        lines = ["# TYPE suparock_span_duration_seconds histogram", "# UNIT suparock_span_duration_seconds seconds"]
+        with self._lock:
+            for name, buckets in sorted(self.buckets.items()):
+                for bound, count in zip(DURATION_BUCKETS, buckets):
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'suparock_span_duration_seconds_bucket{{span="{name}",le="{le}"}} {count}')
+                lines.append(f'suparock_span_duration_seconds_sum{{span="{name}"}} {self.durations[name]:.6f}')
+                lines.append(f'suparock_span_duration_seconds_count{{span="{name}"}} {self.counts[name]}')
+            lines.append("# TYPE suparock_span_errors counter")
+            for name, count in sorted(self.errors.items()):
+                lines.append(f'suparock_span_errors_total{{span="{name}"}} {count}')
+            lines.append("# TYPE suparock_tokens counter")
+            for (name, direction), count in sorted(self.tokens.items()):
+                if count:
+                    lines.append(f'suparock_tokens_total{{span="{name}",direction="{direction}"}} {count}')
+            lines.append("# TYPE suparock_bytes counter")
+            for name, count in sorted(self.bytes.items()):
+                if count:
+                    lines.append(f'suparock_bytes_total{{span="{name}"}} {count}')
+            lines.append("# TYPE suparock_cache_lookups counter")
+            for (name, result), count in sorted(self.cache.items()):
+                lines.append(f'suparock_cache_lookups_total{{span="{name}",result="{result}"}} {count}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """
+    Collects finished spans per trace, feeds the metrics and, with a path set, appends them to
+    the JSONL trace file.
+
+    Spans are written in batches, when the root span of a trace ends or flush_spans spans are
+    pending, rather than opening the file for every span.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = TRACE_FILE,
+        maxsize: int = TRACE_BUFFER_SIZE,
+        flush_spans: int = TRACE_FLUSH_SPANS,
+    ):
+        self.path = path
+        self.flush_spans = flush_spans
+        self.metrics = Metrics()
+        self.traces = LRUCache(maxsize=maxsize)
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, item: Span) -> None:
+        self.metrics.observe(item)
+        with self._lock:
+            spans = self.traces.get(item.trace_id)
+            if spans is None:
+                spans = []
+                self.traces.set(item.trace_id, spans)
+            spans.append(item)
+            if self.path:
+                self._pending.append(json.dumps(item.to_dict(), default=str) + "\n")
+                if item.parent_id is None or len(self._pending) >= self.flush_spans:
+                    self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.writelines(self._pending)
+        self._pending.clear()
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Returns the finished spans of a trace, ordered by start time."""
+        with self._lock:
+            spans = list(self.traces.get(trace_id) or [])
+        return [item.to_dict() for item in sorted(spans, key=lambda item: item.start)]
+
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records LangChain LLM, tool and retriever runs as spans.
+
+    Runs are parented to the span of their nearest recorded ancestor run, or to the span
+    that was current when the outermost run started. Tool and retriever spans become the
+    current span while they run, so spans opened inside a tool nest under it.
+    """
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        self._parents: Dict[UUID, Optional[Span]] = {}
+        self._tokens: Dict[UUID, Any] = {}
+
+    def _parent(self, parent_run_id: Optional[UUID]) -> Optional[Span]:
+        if parent_run_id is None:
+            return current_span.get()
+        return self._spans.get(parent_run_id) or self._parents.get(parent_run_id) or current_span.get()
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, activate: bool = False, **attributes) -> None:
+        item = start_span(name, kind, parent=self._parent(parent_run_id), **attributes)
+        self._spans[run_id] = item
+        if activate:
+            self._tokens[run_id] = current_span.set(item)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes) -> None:
+        item = self._spans.pop(run_id, None)
+        token = self._tokens.pop(run_id, None)
+        if token is not None:
+            try:
+                current_span.reset(token)
+            except ValueError:
+                # Ended from another context, e.g. an async tool run across tasks
+                pass
+        if item is not None:
+            item.set(**attributes)
+            item.end(error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs) -> None:
+        # Chains are not recorded, but their children are parented through them
+        self._parents[run_id] = self._parent(parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs) -> None:
+        self._parents.pop(run_id, None)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        self._parents.pop(run_id, None)
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        tags: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        text = "".join(get_buffer_string(batch) for batch in messages)
+        self._start(run_id, parent_run_id, "llm", "llm", estimated_input_tokens=estimate_tokens(text), bytes=len(text), tags=tags or [])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        item = self._spans.get(run_id)
+        llm_output = response.llm_output or {}
+        usage = llm_output.get("usage") or {}
+        text = "".join(generation.text for generations in response.generations for generation in generations)
+        estimated = item.attributes.get("estimated_input_tokens", 0) if item else 0
+        if item and llm_output.get("model_id"):
+            item.set(model_id=llm_output["model_id"], route=llm_output.get("route"), fallback=llm_output.get("fallback"))
+        self._end(
+            run_id,
+            input_tokens=usage.get("prompt_tokens") or estimated,
+            output_tokens=usage.get("completion_tokens") or estimate_tokens(text),
+            bytes=(item.attributes.get("bytes", 0) if item else 0) + len(text),
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized, input_str: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool:{name}", "tool", activate=True, bytes=len(input_str or ""))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs) -> None:
+        item = self._spans.get(run_id)
+        self._end(run_id, bytes=(item.attributes.get("bytes", 0) if item else 0) + len(str(output)))
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
+
+    def on_retriever_start(self, serialized, query: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs) -> None:
+        self._start(run_id, parent_run_id, "retriever", "retriever", activate=True)
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, documents=len(documents), bytes=sum(len(doc.page_content) for doc in documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = tracer.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serves /metrics on the host and port from a daemon thread; started once per process, port 0 disables it."""
+    global _metrics_server
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+            except OSError:
+                # Already served by another process on this host
+                return None
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
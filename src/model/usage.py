@@ -0,0 +1,61 @@
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, get_buffer_string
+from langchain_core.outputs import LLMResult
+
+from src.model.tokens import estimate_tokens
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    Records the tokens of every LLM call in a run, one entry per call.
+
+    Input tokens come from the Bedrock usage when the response reports it and are
+    estimated from the prompt text otherwise. Calls through the model router also record
+    the route, the model that answered and its latency.
+    """
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+        self._prompts: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        tags: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> None:
+        text = "".join(get_buffer_string(batch) for batch in messages)
+        self._prompts[run_id] = (estimate_tokens(text), tags or [])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        estimated, tags = self._prompts.pop(run_id, (0, []))
+        llm_output = response.llm_output or {}
+        usage = llm_output.get("usage") or {}
+        self.steps.append(
+            {
+                "step": len(self.steps) + 1,
+                "input_tokens": usage.get("prompt_tokens") or estimated,
+                "output_tokens": usage.get("completion_tokens", 0),
+                "estimated_input_tokens": estimated,
+                "tags": tags,
+                "route": llm_output.get("route"),
+                "model_id": llm_output.get("model_id"),
+                "latency_ms": llm_output.get("latency_ms"),
+            }
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._prompts.pop(run_id, None)
+
+    def totals(self) -> Dict[str, int]:
+        return {
+            "steps": len(self.steps),
+            "input_tokens": sum(step["input_tokens"] for step in self.steps),
+            "output_tokens": sum(step["output_tokens"] for step in self.steps),
+        }
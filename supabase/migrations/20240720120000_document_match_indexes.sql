@@ -0,0 +1,128 @@
+-- Make sure every document table exists, including web_service_documents which
+-- the remote schema dump dropped
+create extension if not exists vector with schema extensions;
+
+create table if not exists
+  aws_documents (
+    id uuid primary key,
+    content text, -- corresponds to Document.pageContent
+    metadata jsonb, -- corresponds to Document.metadata
+    embedding vector (1024) -- Titan Text Embeddings v2
+  );
+
+create table if not exists
+  diagrams_documents (
+    id uuid primary key,
+    content text, -- corresponds to Document.pageContent
+    metadata jsonb, -- corresponds to Document.metadata
+    embedding vector (1024) -- Titan Text Embeddings v2
+  );
+
+create table if not exists
+  web_service_documents (
+    id uuid primary key,
+    content text, -- corresponds to Document.pageContent
+    metadata jsonb, -- corresponds to Document.metadata
+    embedding vector (1024) -- Titan Text Embeddings v2
+  );
+
+-- HNSW indexes so nearest neighbour search no longer scans and sorts the whole table
+
+create index if not exists aws_documents_embedding_idx
+  on aws_documents using hnsw (embedding vector_cosine_ops);
+
+create index if not exists diagrams_documents_embedding_idx
+  on diagrams_documents using hnsw (embedding vector_cosine_ops);
+
+create index if not exists web_service_documents_embedding_idx
+  on web_service_documents using hnsw (embedding vector_cosine_ops);
+
+-- Replace the match functions with versions that apply the similarity threshold and
+-- LIMIT inside the database, so only match_count rows are returned over PostgREST
+
+drop function if exists match_aws_documents (query_embedding vector, filter jsonb);
+
+create or replace function match_aws_documents (
+  query_embedding vector (1024),
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    content,
+    metadata,
+    1 - (aws_documents.embedding <=> query_embedding) as similarity
+  from aws_documents
+  where metadata @> filter
+    and 1 - (aws_documents.embedding <=> query_embedding) > match_threshold
+  order by aws_documents.embedding <=> query_embedding
+  limit match_count;
+end;
+$$;
+
+drop function if exists match_diagrams_documents (query_embedding vector, filter jsonb);
+
+create or replace function match_diagrams_documents (
+  query_embedding vector (1024),
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    content,
+    metadata,
+    1 - (diagrams_documents.embedding <=> query_embedding) as similarity
+  from diagrams_documents
+  where metadata @> filter
+    and 1 - (diagrams_documents.embedding <=> query_embedding) > match_threshold
+  order by diagrams_documents.embedding <=> query_embedding
+  limit match_count;
+end;
+$$;
+
+drop function if exists match_web_service_documents (query_embedding vector, filter jsonb);
+
+create or replace function match_web_service_documents (
+  query_embedding vector (1024),
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    content,
+    metadata,
+    1 - (web_service_documents.embedding <=> query_embedding) as similarity
+  from web_service_documents
+  where metadata @> filter
+    and 1 - (web_service_documents.embedding <=> query_embedding) > match_threshold
+  order by web_service_documents.embedding <=> query_embedding
+  limit match_count;
+end;
+$$;
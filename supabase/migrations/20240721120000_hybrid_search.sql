@@ -0,0 +1,191 @@
+-- Full-text search columns so exact identifiers such as t3.medium, aws_s3_bucket or
+-- diagrams.aws.compute.EC2 can be matched lexically alongside the vector search
+
+alter table aws_documents
+  add column if not exists fts tsvector generated always as (to_tsvector('english', coalesce(content, ''))) stored;
+
+create index if not exists aws_documents_fts_idx on aws_documents using gin (fts);
+
+alter table diagrams_documents
+  add column if not exists fts tsvector generated always as (to_tsvector('english', coalesce(content, ''))) stored;
+
+create index if not exists diagrams_documents_fts_idx on diagrams_documents using gin (fts);
+
+alter table web_service_documents
+  add column if not exists fts tsvector generated always as (to_tsvector('english', coalesce(content, ''))) stored;
+
+create index if not exists web_service_documents_fts_idx on web_service_documents using gin (fts);
+
+-- Hybrid search: fuse the full-text and vector rankings with reciprocal rank fusion.
+-- Query lexemes are OR-ed together so long natural language questions still match.
+
+create or replace function hybrid_match_aws_documents (
+  query_text text,
+  query_embedding vector (1024),
+  filter jsonb default '{}',
+  match_count int default 5,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+with query as (
+  select to_tsquery(
+    'english',
+    (select string_agg(quote_literal(lexeme), ' | ')
+     from unnest(tsvector_to_array(to_tsvector('english', query_text))) as lexeme)
+  ) as tsq
+),
+full_text as (
+  select
+    aws_documents.id,
+    row_number() over (order by ts_rank_cd(aws_documents.fts, query.tsq) desc) as rank_ix
+  from aws_documents, query
+  where aws_documents.fts @@ query.tsq
+    and aws_documents.metadata @> filter
+  order by rank_ix
+  limit match_count * 2
+),
+semantic as (
+  -- The nearest rows come from the HNSW index first and are numbered afterwards
+  select
+    nearest.id,
+    row_number() over (order by nearest.distance) as rank_ix
+  from (
+    select aws_documents.id, aws_documents.embedding <=> query_embedding as distance
+    from aws_documents
+    where aws_documents.metadata @> filter
+    order by aws_documents.embedding <=> query_embedding
+    limit match_count * 2
+  ) as nearest
+)
+select
+  aws_documents.id,
+  aws_documents.content,
+  aws_documents.metadata,
+  coalesce(1.0 / (rrf_k + full_text.rank_ix), 0.0) * full_text_weight
+    + coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) * semantic_weight as similarity
+from full_text
+  full outer join semantic on full_text.id = semantic.id
+  join aws_documents on coalesce(full_text.id, semantic.id) = aws_documents.id
+order by similarity desc
+limit match_count;
+$$;
+
+create or replace function hybrid_match_diagrams_documents (
+  query_text text,
+  query_embedding vector (1024),
+  filter jsonb default '{}',
+  match_count int default 5,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+with query as (
+  select to_tsquery(
+    'english',
+    (select string_agg(quote_literal(lexeme), ' | ')
+     from unnest(tsvector_to_array(to_tsvector('english', query_text))) as lexeme)
+  ) as tsq
+),
+full_text as (
+  select
+    diagrams_documents.id,
+    row_number() over (order by ts_rank_cd(diagrams_documents.fts, query.tsq) desc) as rank_ix
+  from diagrams_documents, query
+  where diagrams_documents.fts @@ query.tsq
+    and diagrams_documents.metadata @> filter
+  order by rank_ix
+  limit match_count * 2
+),
+semantic as (
+  -- The nearest rows come from the HNSW index first and are numbered afterwards
+  select
+    nearest.id,
+    row_number() over (order by nearest.distance) as rank_ix
+  from (
+    select diagrams_documents.id, diagrams_documents.embedding <=> query_embedding as distance
+    from diagrams_documents
+    where diagrams_documents.metadata @> filter
+    order by diagrams_documents.embedding <=> query_embedding
+    limit match_count * 2
+  ) as nearest
+)
+select
+  diagrams_documents.id,
+  diagrams_documents.content,
+  diagrams_documents.metadata,
+  coalesce(1.0 / (rrf_k + full_text.rank_ix), 0.0) * full_text_weight
+    + coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) * semantic_weight as similarity
+from full_text
+  full outer join semantic on full_text.id = semantic.id
+  join diagrams_documents on coalesce(full_text.id, semantic.id) = diagrams_documents.id
+order by similarity desc
+limit match_count;
+$$;
+
+create or replace function hybrid_match_web_service_documents (
+  query_text text,
+  query_embedding vector (1024),
+  filter jsonb default '{}',
+  match_count int default 5,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+with query as (
+  select to_tsquery(
+    'english',
+    (select string_agg(quote_literal(lexeme), ' | ')
+     from unnest(tsvector_to_array(to_tsvector('english', query_text))) as lexeme)
+  ) as tsq
+),
+full_text as (
+  select
+    web_service_documents.id,
+    row_number() over (order by ts_rank_cd(web_service_documents.fts, query.tsq) desc) as rank_ix
+  from web_service_documents, query
+  where web_service_documents.fts @@ query.tsq
+    and web_service_documents.metadata @> filter
+  order by rank_ix
+  limit match_count * 2
+),
+semantic as (
+  -- The nearest rows come from the HNSW index first and are numbered afterwards
+  select
+    nearest.id,
+    row_number() over (order by nearest.distance) as rank_ix
+  from (
+    select web_service_documents.id, web_service_documents.embedding <=> query_embedding as distance
+    from web_service_documents
+    where web_service_documents.metadata @> filter
+    order by web_service_documents.embedding <=> query_embedding
+    limit match_count * 2
+  ) as nearest
+)
+select
+  web_service_documents.id,
+  web_service_documents.content,
+  web_service_documents.metadata,
+  coalesce(1.0 / (rrf_k + full_text.rank_ix), 0.0) * full_text_weight
+    + coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) * semantic_weight as similarity
+from full_text
+  full outer join semantic on full_text.id = semantic.id
+  join web_service_documents on coalesce(full_text.id, semantic.id) = web_service_documents.id
+order by similarity desc
+limit match_count;
+$$;
@@ -0,0 +1,380 @@
+-- Configurable embedding size and compact HNSW indexes.
+--
+-- Titan v2 can return 256, 512 or 1024 dimensions, so the embedding columns become untyped
+-- vectors and the HNSW index is an expression index over the configured size and storage:
+--   vector   float32, exact cosine distance
+--   halfvec  float16, half the index size
+--   binary   1 bit per dimension with hamming distance, 1/32 of the index size
+-- The full-precision vector stays in the table, so compact indexes only pick candidates and
+-- the match functions re-rank them by exact cosine distance. seed_text re-embeds the rows and
+-- calls create_embedding_index whenever EMBEDDING_DIMENSIONS or EMBEDDING_STORAGE change.
+-- Expression indexes over halfvec and bit need pgvector 0.7 or later.
+
+drop index if exists aws_documents_embedding_idx;
+drop index if exists diagrams_documents_embedding_idx;
+drop index if exists web_service_documents_embedding_idx;
+
+alter table aws_documents alter column embedding type vector;
+alter table diagrams_documents alter column embedding type vector;
+alter table web_service_documents alter column embedding type vector;
+
+create table if not exists
+  embedding_config (
+    table_name text primary key,
+    dimensions int not null check (dimensions in (256, 512, 1024)),
+    storage text not null check (storage in ('vector', 'halfvec', 'binary'))
+  );
+
+create or replace function embedding_index_expression (
+  column_expression text,
+  dimensions int,
+  storage text
+) returns text language sql immutable as $$
+  select case storage
+    when 'halfvec' then format('(%s)::halfvec(%s)', column_expression, dimensions)
+    when 'binary' then format('binary_quantize(%s)::bit(%s)', column_expression, dimensions)
+    else format('(%s)::vector(%s)', column_expression, dimensions)
+  end;
+$$;
+
+-- (Re)builds a document table's HNSW index and records its configuration. Runs as the table
+-- owner, so only the service role may call it.
+
+create or replace function create_embedding_index (
+  table_name text,
+  dimensions int,
+  storage text
+) returns void language plpgsql security definer set search_path = public, extensions as $$
+begin
+  if table_name not in ('aws_documents', 'diagrams_documents', 'web_service_documents') then
+    raise exception 'unknown document table %', table_name;
+  end if;
+
+  execute format('drop index if exists %I', table_name || '_embedding_idx');
+  execute format(
+    'create index %I on %I using hnsw ((%s) %s)',
+    table_name || '_embedding_idx',
+    table_name,
+    embedding_index_expression('embedding', dimensions, storage),
+    case storage when 'halfvec' then 'halfvec_cosine_ops' when 'binary' then 'bit_hamming_ops' else 'vector_cosine_ops' end
+  );
+
+  insert into embedding_config (table_name, dimensions, storage)
+  values ($1, $2, $3)
+  on conflict on constraint embedding_config_pkey
+    do update set dimensions = excluded.dimensions, storage = excluded.storage;
+end;
+$$;
+
+-- Drops the index before rows are re-embedded at another size, which the old index expression
+-- could not hold. Queries fall back to an exact scan until create_embedding_index runs.
+
+create or replace function drop_embedding_index (
+  table_name text
+) returns void language plpgsql security definer set search_path = public, extensions as $$
+begin
+  if table_name not in ('aws_documents', 'diagrams_documents', 'web_service_documents') then
+    raise exception 'unknown document table %', table_name;
+  end if;
+
+  execute format('drop index if exists %I', table_name || '_embedding_idx');
+  delete from embedding_config where embedding_config.table_name = $1;
+end;
+$$;
+
+revoke execute on function create_embedding_index (text, int, text) from public, anon, authenticated;
+revoke execute on function drop_embedding_index (text) from public, anon, authenticated;
+grant execute on function create_embedding_index (text, int, text) to service_role;
+grant execute on function drop_embedding_index (text) to service_role;
+
+select create_embedding_index ('aws_documents', 1024, 'vector');
+select create_embedding_index ('diagrams_documents', 1024, 'vector');
+select create_embedding_index ('web_service_documents', 1024, 'vector');
+
+-- Nearest neighbours of a document table. The index expression picks match_count * rescore_factor
+-- candidates (match_count with the exact vector index), which are re-ranked by exact cosine
+-- similarity. Rows of another size, left over while seed_text migrates a table, are skipped,
+-- and without a matching index the table is scanned exactly.
+
+create or replace function match_document_embeddings (
+  table_name text,
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql stable as $$
+declare
+  config embedding_config%rowtype;
+  candidate_order text := 'embedding <=> $1';
+  candidate_count int := match_count;
+begin
+  select * into config from embedding_config where embedding_config.table_name = $1;
+
+  if found and config.dimensions = vector_dims(query_embedding) then
+    candidate_order := format(
+      '%s %s %s',
+      embedding_index_expression('embedding', config.dimensions, config.storage),
+      case config.storage when 'binary' then '<~>' else '<=>' end,
+      embedding_index_expression('$1', config.dimensions, config.storage)
+    );
+    if config.storage <> 'vector' then
+      candidate_count := match_count * rescore_factor;
+    end if;
+  end if;
+
+  return query execute format(
+    $query$
+    select id, content, metadata, similarity
+    from (
+      select id, content, metadata, 1 - (embedding <=> $1) as similarity
+      from (
+        select id, content, metadata, embedding
+        from %I
+        where metadata @> $2
+          and vector_dims(embedding) = vector_dims($1)
+        order by %s
+        limit $3
+      ) candidates
+    ) rescored
+    where similarity > $4
+    order by similarity desc
+    limit $5
+    $query$,
+    table_name,
+    candidate_order
+  ) using query_embedding, filter, candidate_count, match_threshold, match_count;
+end;
+$$;
+
+-- The per-table functions called by the vector stores take the rescore factor as well
+
+drop function if exists match_aws_documents (vector, jsonb, int, float);
+
+create or replace function match_aws_documents (
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+  select * from match_document_embeddings (
+    'aws_documents', query_embedding, filter, match_count, match_threshold, rescore_factor
+  );
+$$;
+
+drop function if exists match_diagrams_documents (vector, jsonb, int, float);
+
+create or replace function match_diagrams_documents (
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+  select * from match_document_embeddings (
+    'diagrams_documents', query_embedding, filter, match_count, match_threshold, rescore_factor
+  );
+$$;
+
+drop function if exists match_web_service_documents (vector, jsonb, int, float);
+
+create or replace function match_web_service_documents (
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+  select * from match_document_embeddings (
+    'web_service_documents', query_embedding, filter, match_count, match_threshold, rescore_factor
+  );
+$$;
+
+-- Hybrid search takes its semantic ranking from match_document_embeddings, so it uses the
+-- compact index and exact rescoring too
+
+drop function if exists hybrid_match_aws_documents (text, vector, jsonb, int, float, float, int);
+
+create or replace function hybrid_match_aws_documents (
+  query_text text,
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+with query as (
+  select to_tsquery(
+    'english',
+    (select string_agg(quote_literal(lexeme), ' | ')
+     from unnest(tsvector_to_array(to_tsvector('english', query_text))) as lexeme)
+  ) as tsq
+),
+full_text as (
+  select
+    aws_documents.id,
+    row_number() over (order by ts_rank_cd(aws_documents.fts, query.tsq) desc) as rank_ix
+  from aws_documents, query
+  where aws_documents.fts @@ query.tsq
+    and aws_documents.metadata @> filter
+  order by rank_ix
+  limit match_count * 2
+),
+semantic as (
+  select
+    matches.id,
+    row_number() over (order by matches.similarity desc) as rank_ix
+  from match_document_embeddings (
+    'aws_documents', query_embedding, filter, match_count * 2, '-infinity', rescore_factor
+  ) as matches
+)
+select
+  aws_documents.id,
+  aws_documents.content,
+  aws_documents.metadata,
+  coalesce(1.0 / (rrf_k + full_text.rank_ix), 0.0) * full_text_weight
+    + coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) * semantic_weight as similarity
+from full_text
+  full outer join semantic on full_text.id = semantic.id
+  join aws_documents on coalesce(full_text.id, semantic.id) = aws_documents.id
+order by similarity desc
+limit match_count;
+$$;
+
+drop function if exists hybrid_match_diagrams_documents (text, vector, jsonb, int, float, float, int);
+
+create or replace function hybrid_match_diagrams_documents (
+  query_text text,
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+with query as (
+  select to_tsquery(
+    'english',
+    (select string_agg(quote_literal(lexeme), ' | ')
+     from unnest(tsvector_to_array(to_tsvector('english', query_text))) as lexeme)
+  ) as tsq
+),
+full_text as (
+  select
+    diagrams_documents.id,
+    row_number() over (order by ts_rank_cd(diagrams_documents.fts, query.tsq) desc) as rank_ix
+  from diagrams_documents, query
+  where diagrams_documents.fts @@ query.tsq
+    and diagrams_documents.metadata @> filter
+  order by rank_ix
+  limit match_count * 2
+),
+semantic as (
+  select
+    matches.id,
+    row_number() over (order by matches.similarity desc) as rank_ix
+  from match_document_embeddings (
+    'diagrams_documents', query_embedding, filter, match_count * 2, '-infinity', rescore_factor
+  ) as matches
+)
+select
+  diagrams_documents.id,
+  diagrams_documents.content,
+  diagrams_documents.metadata,
+  coalesce(1.0 / (rrf_k + full_text.rank_ix), 0.0) * full_text_weight
+    + coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) * semantic_weight as similarity
+from full_text
+  full outer join semantic on full_text.id = semantic.id
+  join diagrams_documents on coalesce(full_text.id, semantic.id) = diagrams_documents.id
+order by similarity desc
+limit match_count;
+$$;
+
+drop function if exists hybrid_match_web_service_documents (text, vector, jsonb, int, float, float, int);
+
+create or replace function hybrid_match_web_service_documents (
+  query_text text,
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  full_text_weight float default 1,
+  semantic_weight float default 1,
+  rrf_k int default 50,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language sql stable as $$
+with query as (
+  select to_tsquery(
+    'english',
+    (select string_agg(quote_literal(lexeme), ' | ')
+     from unnest(tsvector_to_array(to_tsvector('english', query_text))) as lexeme)
+  ) as tsq
+),
+full_text as (
+  select
+    web_service_documents.id,
+    row_number() over (order by ts_rank_cd(web_service_documents.fts, query.tsq) desc) as rank_ix
+  from web_service_documents, query
+  where web_service_documents.fts @@ query.tsq
+    and web_service_documents.metadata @> filter
+  order by rank_ix
+  limit match_count * 2
+),
+semantic as (
+  select
+    matches.id,
+    row_number() over (order by matches.similarity desc) as rank_ix
+  from match_document_embeddings (
+    'web_service_documents', query_embedding, filter, match_count * 2, '-infinity', rescore_factor
+  ) as matches
+)
+select
+  web_service_documents.id,
+  web_service_documents.content,
+  web_service_documents.metadata,
+  coalesce(1.0 / (rrf_k + full_text.rank_ix), 0.0) * full_text_weight
+    + coalesce(1.0 / (rrf_k + semantic.rank_ix), 0.0) * semantic_weight as similarity
+from full_text
+  full outer join semantic on full_text.id = semantic.id
+  join web_service_documents on coalesce(full_text.id, semantic.id) = web_service_documents.id
+order by similarity desc
+limit match_count;
+$$;
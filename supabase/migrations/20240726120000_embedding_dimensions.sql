@@ -0,0 +1,20 @@
+-- Size of every stored embedding of a document table, so seed_text re-embeds only the rows a
+-- dimension change has not migrated yet and an interrupted migration resumes where it stopped.
+
+create or replace function document_embedding_dimensions (
+  table_name text
+) returns table (
+  id uuid,
+  dimensions int
+) language plpgsql stable as $$
+begin
+  if table_name not in ('aws_documents', 'diagrams_documents', 'web_service_documents') then
+    raise exception 'unknown document table %', table_name;
+  end if;
+
+  return query execute format('select id, vector_dims(embedding) from %I order by id', table_name);
+end;
+$$;
+
+revoke execute on function document_embedding_dimensions (text) from public, anon, authenticated;
+grant execute on function document_embedding_dimensions (text) to service_role;
@@ -0,0 +1,69 @@
+-- match_document_embeddings checks the table name against the document tables, like the other
+-- dynamic-SQL functions, and raises hnsw.ef_search to the number of candidates it asks the index
+-- for. With the default of 40, an HNSW scan returns at most 40 rows, so the halfvec and binary
+-- indexes silently handed the rescoring step fewer candidates than match_count * rescore_factor
+-- (160 for hybrid search with the defaults). Candidates are capped at pgvector's ef_search
+-- maximum of 1000.
+
+create or replace function match_document_embeddings (
+  table_name text,
+  query_embedding vector,
+  filter jsonb default '{}',
+  match_count int default 5,
+  match_threshold float default 0,
+  rescore_factor int default 4
+) returns table (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+) language plpgsql stable as $$
+declare
+  config embedding_config%rowtype;
+  candidate_order text := 'embedding <=> $1';
+  candidate_count int := least(match_count, 1000);
+begin
+  if table_name not in ('aws_documents', 'diagrams_documents', 'web_service_documents') then
+    raise exception 'unknown document table %', table_name;
+  end if;
+
+  select * into config from embedding_config where embedding_config.table_name = $1;
+
+  if found and config.dimensions = vector_dims(query_embedding) then
+    candidate_order := format(
+      '%s %s %s',
+      embedding_index_expression('embedding', config.dimensions, config.storage),
+      case config.storage when 'binary' then '<~>' else '<=>' end,
+      embedding_index_expression('$1', config.dimensions, config.storage)
+    );
+    if config.storage <> 'vector' then
+      candidate_count := least(match_count * rescore_factor, 1000);
+    end if;
+  end if;
+
+  -- Local to the calling transaction, so other queries keep the default
+  perform set_config('hnsw.ef_search', greatest(candidate_count, 40)::text, true);
+
+  return query execute format(
+    $query$
+    select id, content, metadata, similarity
+    from (
+      select id, content, metadata, 1 - (embedding <=> $1) as similarity
+      from (
+        select id, content, metadata, embedding
+        from %I
+        where metadata @> $2
+          and vector_dims(embedding) = vector_dims($1)
+        order by %s
+        limit $3
+      ) candidates
+    ) rescored
+    where similarity > $4
+    order by similarity desc
+    limit $5
+    $query$,
+    table_name,
+    candidate_order
+  ) using query_embedding, filter, candidate_count, match_threshold, match_count;
+end;
+$$;